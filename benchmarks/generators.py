@@ -0,0 +1,102 @@
+"""
+Generators of synthetic repositories and CODEOWNERS files for the benchmarks
+"""
+from __future__ import annotations
+
+import os
+import random
+import struct
+
+_EXTENSIONS = ['py', 'md', 'go', 'js', 'ts', 'yaml', 'json', 'txt', 'sh', 'c']
+_DIRECTORY_NAMES = [
+    'src', 'lib', 'docs', 'test', 'tests', 'api', 'internal', 'pkg', 'cmd',
+    'ui', 'components', 'utils', 'config', 'scripts', 'build', 'vendor',
+]
+
+
+def generate_file_paths(count, depth=6, fanout=12, seed=0):
+    """
+    Returns count file paths spread over a tree of directories
+    """
+    rng = random.Random(seed)
+    directories = ['']
+    paths = []
+    while len(paths) < count:
+        parent = rng.choice(directories)
+        if parent.count('/') < depth and rng.random() < 1 / fanout:
+            name = f'{rng.choice(_DIRECTORY_NAMES)}{rng.randrange(100)}'
+            directories.append(f'{parent}{name}/')
+            continue
+        extension = rng.choice(_EXTENSIONS)
+        paths.append(f'{parent}file{len(paths)}.{extension}')
+    return sorted(set(paths))
+
+
+def write_tree(root, file_paths):
+    """
+    Creates an empty file for every path under root
+    """
+    for path in file_paths:
+        full_path = os.path.join(root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        open(full_path, 'w').close()
+
+
+def write_git_index(root, file_paths):
+    """
+    Writes a version 2 git index tracking file_paths under root, without
+    creating the files themselves
+    """
+    git_dir = os.path.join(root, '.git')
+    os.makedirs(git_dir, exist_ok=True)
+    names = sorted(path.encode() for path in file_paths)
+    with open(os.path.join(git_dir, 'index'), 'wb') as f:
+        f.write(struct.pack('>4sLL', b'DIRC', 2, len(names)))
+        for name in names:
+            entry = struct.pack(
+                '>24xL12x20xH', 0o100644, min(len(name), 0xFFF)) + name
+            f.write(entry + b'\0' * (8 - len(entry) % 8))
+        f.write(b'\0' * 20)
+
+
+def generate_codeowners(file_paths, entries, sections=20, missing_ratio=0.05, seed=0):
+    """
+    Returns the lines of a CODEOWNERS file with about entries paths over
+    sections sections, mixing globs, anchored files, directories and bare
+    names taken from file_paths, and a share of paths matching nothing
+    """
+    rng = random.Random(seed)
+    owners = [f'@group{i}/team{i % 9}' for i in range(50)] + \
+        [f'user{i}@example.com' for i in range(50)]
+    lines = ['# generated CODEOWNERS', '']
+    per_section = max(1, entries // sections)
+    for section in range(sections):
+        if section:
+            optional = '^' if section % 5 == 0 else ''
+            lines.extend(['', f'{optional}[Section{section:04d}]'])
+        for _ in range(per_section):
+            file_path = rng.choice(file_paths)
+            directory, _, name = file_path.rpartition('/')
+            kind = rng.random()
+            if rng.random() < missing_ratio:
+                path = f'/missing/{rng.randrange(10**6)}/'
+            elif kind < 0.3:
+                path = f'/{file_path}'
+            elif kind < 0.55 and directory:
+                path = f'/{directory}/'
+            elif kind < 0.65:
+                path = name
+            elif kind < 0.8:
+                path = f'*.{name.rpartition(".")[2]}'
+            elif kind < 0.9 and directory:
+                path = f'/{directory.split("/")[0]}/**/*.{name.rpartition(".")[2]}'
+            else:
+                path = f'{directory}/*' if directory else '*'
+            entry_owners = ' '.join(rng.sample(owners, rng.randint(1, 3)))
+            lines.append(f'{path} {entry_owners}')
+    return lines
+
+
+def write_codeowners(file_path, lines):
+    with open(file_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
@@ -0,0 +1,77 @@
+"""
+Measures the memory used by a parsed CODEOWNERS file.
+
+The parsed data is measured twice: with the slotted data model of
+gitlab_codeowners_linter.parser, and with plain classes carrying a
+per-instance __dict__ and their own comment and owner lists, like the
+original data model.
+
+Usage: python benchmarks/memory_benchmark.py [--entries N]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+from generators import generate_codeowners
+from generators import generate_file_paths
+from generators import write_codeowners
+
+from gitlab_codeowners_linter import parser
+from gitlab_codeowners_linter.parser import parse_codeowners
+
+
+class DictCodeownerSection:
+    def __init__(self, section_name, comment_block, entries, line=0):
+        self.codeowner_section = section_name
+        self.comments = list(comment_block)
+        self.entries = entries
+        self.line = line
+
+
+class DictCodeownerEntry:
+    def __init__(self, path, comment_block, owners='', line=0):
+        self.path = path
+        self.comments = list(comment_block)
+        # every entry has its own copy of the owner strings
+        self.owners = [''.join(owner) for owner in owners]
+        self.line = line
+
+
+def measure(file_path):
+    tracemalloc.start()
+    codeowners_data = parse_codeowners(file_path)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    entries = sum(len(section.entries) for section in codeowners_data)
+    return current, entries
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    arg_parser.add_argument('--entries', type=int, default=100000)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'CODEOWNERS')
+        write_codeowners(file_path, generate_codeowners(
+            generate_file_paths(args.entries), args.entries, sections=50))
+
+        with patch.object(parser, 'CodeownerSection', DictCodeownerSection), \
+                patch.object(parser, 'CodeownerEntry', DictCodeownerEntry):
+            dict_size, entries = measure(file_path)
+        slots_size, _ = measure(file_path)
+
+    print(f'entries: {entries}')
+    print(
+        f'dict based model:    {dict_size / 2**20:8.1f} MiB ({dict_size / entries:6.1f} bytes/entry)')
+    print(
+        f'slotted model:       {slots_size / 2**20:8.1f} MiB ({slots_size / entries:6.1f} bytes/entry)')
+    print(f'reduction:           {1 - slots_size / dict_size:8.1%}')
+
+
+if __name__ == '__main__':
+    main()
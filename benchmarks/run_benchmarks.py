@@ -0,0 +1,142 @@
+"""
+Times every phase of the linter, and every rule needing the files of the
+tree, on synthetic repositories and CODEOWNERS files, and prints the
+results as JSON so they can be compared between releases. The formatting
+rules are evaluated in a single pass, they are timed together.
+
+Usage: python benchmarks/run_benchmarks.py [--files N ...] [--entries N ...]
+    [--sections N] [--source index|walk] [--repeat N] [--output FILE]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+from generators import generate_codeowners
+from generators import generate_file_paths
+from generators import write_codeowners
+from generators import write_git_index
+from generators import write_tree
+
+from gitlab_codeowners_linter import checks
+from gitlab_codeowners_linter.autofix import fix
+from gitlab_codeowners_linter.coverage import compute_coverage
+from gitlab_codeowners_linter.matching import find_existing
+from gitlab_codeowners_linter.options import LintOptions
+from gitlab_codeowners_linter.parser import parse_codeowners
+from gitlab_codeowners_linter.resolver import OwnershipResolver
+
+
+def _time(function, repeat):
+    """
+    Returns the best wall time of repeat calls and the last result
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_case(file_count, entry_count, sections, source, repeat):
+    root = tempfile.mkdtemp(prefix='codeowners-benchmark-')
+    cwd = os.getcwd()
+    try:
+        file_paths = generate_file_paths(file_count)
+        if source == 'walk':
+            write_tree(root, file_paths)
+        else:
+            write_git_index(root, file_paths)
+        codeowners_file = os.path.join(root, 'CODEOWNERS')
+        write_codeowners(codeowners_file, generate_codeowners(
+            file_paths, entry_count, sections))
+        os.chdir(root)
+
+        phases = {}
+        phases['parse'], codeowners_data = _time(
+            lambda: parse_codeowners(codeowners_file), repeat)
+        phases['formatting_rules'], scan = _time(
+            lambda: checks.scan_codeowners(codeowners_data), repeat)
+        phases['enumerate_files'], files = _time(
+            checks._get_all_filepaths, repeat)
+        paths = list(scan.paths)
+        phases['existence'], _ = _time(
+            lambda: find_existing(paths, files), repeat)
+        phases['match_matrix'], _ = _time(
+            lambda: OwnershipResolver(codeowners_data).index.match_matrix(files), repeat)
+        phases['resolve'], _ = _time(
+            lambda: list(OwnershipResolver(codeowners_data).resolve_many(files)), repeat)
+        violations = checks.check(codeowners_data)
+
+        # the rules needing the files are timed one by one, the formatting
+        # rules share the single pass of formatting_rules
+        options = LintOptions(files=files)
+        rules = {}
+        rules['non-existing-path'], _ = _time(
+            lambda: checks._get_non_existing_paths(codeowners_data, options, paths), repeat)
+        rules['shadowed-entry'], _ = _time(
+            lambda: checks._get_shadowed_entries(
+                codeowners_data, *checks._get_match_matrix(codeowners_data, options)),
+            repeat)
+        rules['coverage'], _ = _time(
+            lambda: compute_coverage(codeowners_data, files), repeat)
+
+        # autofix modifies the parsed data, every run gets a fresh copy
+        copies = [parse_codeowners(codeowners_file) for _ in range(repeat)]
+        phases['autofix'], _ = _time(
+            lambda: fix(copies.pop(), violations, codeowners_file + '.fixed'), repeat)
+
+        return {
+            'files': len(file_paths),
+            'entries': sum(len(section.entries) for section in codeowners_data),
+            'sections': len(codeowners_data),
+            'source': source,
+            'phases': phases,
+            'rules': rules,
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(root)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--files', type=int, nargs='+',
+                        default=[10000, 100000])
+    parser.add_argument('--entries', type=int, nargs='+',
+                        default=[100, 5000])
+    parser.add_argument('--sections', type=int, default=20)
+    parser.add_argument('--source', choices=['index', 'walk'], default='index',
+                        help='enumerate the files from a git index or by walking real files')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the results to this file')
+    args = parser.parse_args()
+
+    results = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cases': [
+            run_case(file_count, entry_count,
+                     args.sections, args.source, args.repeat)
+            for file_count in args.files
+            for entry_count in args.entries
+        ],
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Measures the cold start of the linter, as run by pre-commit.
+
+Every sample starts a new interpreter: once to only import the CLI module,
+and once to lint a clean CODEOWNERS file of a small repository with
+--no_autofix. The best time of the samples is reported, with the modules
+taking the longest to import. Fails when the import takes longer than
+--max_import_ms.
+
+Usage: python benchmarks/startup_benchmark.py [--repeat N] [--max_import_ms MS]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from generators import generate_codeowners
+from generators import generate_file_paths
+from generators import write_codeowners
+from generators import write_git_index
+
+from gitlab_codeowners_linter.codeowners_linter import lint_codeowners_file
+from gitlab_codeowners_linter.options import LintOptions
+
+_IMPORT = 'import gitlab_codeowners_linter.codeowners_linter'
+_LINT = 'from gitlab_codeowners_linter.codeowners_linter import main; main()'
+
+
+def _best_time(args, repeat, cwd=None):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=cwd, check=False,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _slowest_imports(count):
+    """
+    Returns the count modules with the longest cumulative import time
+    """
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _IMPORT],
+        check=True, capture_output=True, text=True).stderr
+    imports = []
+    for line in stderr.splitlines()[1:]:
+        _, cumulative, module = line.split('|')
+        imports.append((int(cumulative), module.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    arg_parser.add_argument('--repeat', type=int, default=10)
+    arg_parser.add_argument('--max_import_ms', type=float, default=None)
+    args = arg_parser.parse_args()
+
+    baseline = _best_time([sys.executable, '-c', 'pass'], args.repeat)
+    import_time = _best_time([sys.executable, '-c', _IMPORT], args.repeat)
+    with tempfile.TemporaryDirectory() as root:
+        file_paths = generate_file_paths(1000)
+        write_git_index(root, file_paths)
+        codeowners_file = os.path.join(root, 'CODEOWNERS')
+        write_codeowners(codeowners_file, generate_codeowners(
+            file_paths, 50, sections=5, missing_ratio=0))
+        # a clean file, as in most pre-commit runs
+        lint_codeowners_file(codeowners_file, False, LintOptions(root=root))
+        lint_time = _best_time(
+            [sys.executable, '-c', _LINT, '--codeowners_file', 'CODEOWNERS',
+             '--no_autofix', '--no_daemon'],
+            args.repeat, cwd=root)
+
+    print(f'interpreter:         {baseline * 1000:8.1f} ms')
+    print(f'import:              {(import_time - baseline) * 1000:8.1f} ms')
+    print(f'clean lint:          {(lint_time - baseline) * 1000:8.1f} ms')
+    print('slowest imports (cumulative):')
+    for cumulative, module in _slowest_imports(10):
+        print(f'  {cumulative / 1000:8.1f} ms  {module}')
+    if args.max_import_ms is not None and (import_time - baseline) * 1000 > args.max_import_ms:
+        sys.exit(
+            f'the import takes more than {args.max_import_ms:g} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,31 @@
 from __future__ import annotations
 
-from functools import cmp_to_key
+import difflib
+import locale
+import os
+import stat
+import tempfile
 
+from gitlab_codeowners_linter import profiling
 from gitlab_codeowners_linter.constants import DEFAULT_SECTION
-from gitlab_codeowners_linter.sorting import sort_paths
-from gitlab_codeowners_linter.sorting import sort_section_names
+from gitlab_codeowners_linter.sorting import path_sort_key
+from gitlab_codeowners_linter.sorting import section_sort_key
 
 
 def fix(codeowners_data, violations, file_path):
+    """
+    Fixes the violations and writes the result to file_path, unless it
+    already has this exact content. Returns the changed line ranges, see
+    _update_codeowners_file.
+    """
 
     # Fix sections first
 
     # Are custom section names sorted?
     if violations.section_names_sorted:
-        sort_sections_names_key = cmp_to_key(sort_section_names)
         sorted_sections_names = sorted(
             codeowners_data[1:],
-            key=sort_sections_names_key,
+            key=section_sort_key,
         )
         codeowners_data_updated = []
         codeowners_data_updated.append(codeowners_data[0])
@@ -79,7 +88,13 @@ def fix(codeowners_data, violations, file_path):
                     codeowners_data_updated[-1], violations.non_existing_paths[section.codeowner_section.lower()])
     codeowners_data = codeowners_data_updated
 
-    _update_codeowners_file(codeowners_data, file_path)
+    with profiling.phase('write') as phase:
+        changed_line_ranges = _update_codeowners_file(
+            codeowners_data, file_path)
+        phase.count('entries', sum(
+            len(section.entries) for section in codeowners_data))
+        phase.count('changed_line_ranges', len(changed_line_ranges))
+    return changed_line_ranges
 
 
 def _fix_blank_lines(section):
@@ -95,9 +110,10 @@ def _fix_blank_lines(section):
 def _fix_unsorted_paths(section):
     entries_updated = []
 
-    sort_paths_key = cmp_to_key(sort_paths)
+    # blank lines have no place among sorted paths, they are dropped even
+    # when the blank-line rule is ignored
     entries_updated = sorted(
-        section.entries, key=sort_paths_key)
+        (entry for entry in section.entries if entry.path.strip()), key=path_sort_key)
     section_updated = section
     section_updated.entries = entries_updated
 
@@ -136,22 +152,90 @@ def _fix_nonexisting_paths(section, non_existing_paths_in_section):
     return section_updated
 
 
+def _render_codeowners(codeowners_data):
+    parts = []
+    for section in codeowners_data:
+        # if the default section is empty let's skip it
+        if section.codeowner_section != DEFAULT_SECTION:
+            parts.append('\n')
+        for comment_line in section.comments:
+            parts.append(f'{comment_line}\n')
+        if section.codeowner_section != DEFAULT_SECTION:
+            parts.append(section.codeowner_section)
+        if section.entries:
+            parts.append('\n')
+            for entry in section.entries:
+                for comment_line in entry.comments:
+                    parts.append(f'{comment_line}\n')
+                owners = ' '.join(str(x) for x in entry.owners)
+                parts.append(f'{entry.path} {owners}\n')
+    return ''.join(parts)
+
+
+def _get_changed_line_ranges(original_lines, new_lines):
+    """
+    Returns the (first, last) line numbers, 1-based and inclusive, of the
+    blocks of original_lines replaced or removed in new_lines. Insertions
+    are reported as the line they were inserted before.
+    """
+    # the fixes are local, only diff what is between the common head and tail
+    length = min(len(original_lines), len(new_lines))
+    start = 0
+    while start < length and original_lines[start] == new_lines[start]:
+        start += 1
+    tail = 0
+    while tail < length - start and original_lines[-1 - tail] == new_lines[-1 - tail]:
+        tail += 1
+    matcher = difflib.SequenceMatcher(
+        None,
+        original_lines[start:len(original_lines) - tail],
+        new_lines[start:len(new_lines) - tail],
+        autojunk=False,
+    )
+    ranges = []
+    for tag, i1, i2, _, _ in matcher.get_opcodes():
+        if tag == 'equal':
+            continue
+        first = start + i1 + 1
+        last = max(start + i2, first)
+        if ranges and first <= ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], max(last, ranges[-1][1]))
+        else:
+            ranges.append((first, last))
+    return ranges
+
+
 def _update_codeowners_file(codeowners_data, file_path):
-    with open(file_path, 'w') as f:
-        for section in codeowners_data:
-            # if the default section is empty let's skip it
-            if section.codeowner_section != DEFAULT_SECTION:
-                f.write('\n')
-            if section.comments:
-                for comment_line in section.comments:
-                    f.write(f'{comment_line}\n')
-            if section.codeowner_section != DEFAULT_SECTION:
-                f.write(f'{section.codeowner_section}')
-            if section.entries:
-                f.write('\n')
-                for entry in section.entries:
-                    if entry.comments:
-                        for comment_line in entry.comments:
-                            f.write(f'{comment_line}\n')
-                    owners = ' '.join(str(x) for x in entry.owners)
-                    f.write(f'{entry.path} {owners}\n')
+    """
+    Writes codeowners_data to file_path, atomically and only if its content
+    changes. Returns the line ranges of the original file that changed, see
+    _get_changed_line_ranges.
+    """
+    # encoded and with line endings as a text mode write would
+    content = _render_codeowners(codeowners_data).replace('\n', os.linesep).encode(
+        locale.getpreferredencoding(False))
+    try:
+        with open(file_path, 'rb') as f:
+            original = f.read()
+        mode = stat.S_IMODE(os.stat(file_path).st_mode)
+    except FileNotFoundError:
+        original = b''
+        # the mode open() would create the file with
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    if content == original:
+        return []
+    # replace the file a symlink points to, not the symlink
+    target_path = os.path.realpath(file_path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(target_path), prefix='.CODEOWNERS.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return _get_changed_line_ranges(original.splitlines(), content.splitlines())
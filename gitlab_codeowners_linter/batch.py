@@ -0,0 +1,130 @@
+# Lint the CODEOWNERS files of many repositories in a single process pool
+# and report the results of all of them as one JSON document.
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from gitlab_codeowners_linter.codeowners_linter import lint_codeowners_file
+from gitlab_codeowners_linter.input import find_codeowners_file
+from gitlab_codeowners_linter.options import LintOptions
+
+
+def _parse_arguments(args):
+    parser = argparse.ArgumentParser(
+        description='Check the codeowners files of many repositories')
+    parser.add_argument('roots', nargs='*',
+                        help='root directories of the repositories')
+    parser.add_argument('--manifest', required=False,
+                        help='file listing one repository root per line')
+    parser.add_argument(
+        '--no_autofix',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to disable autofix',
+    )
+    parser.add_argument('--jobs', type=int, default=0, required=False,
+                        help='number of repositories linted in parallel, 0 to use all the CPUs')
+    parser.add_argument('--cache_dir', required=False,
+                        help='directory where the path existence results are cached between runs')
+    parser.add_argument('--output', required=False,
+                        help='write the report to this file instead of stdout')
+    return parser.parse_args(args)
+
+
+def read_manifest(manifest_path):
+    """
+    Returns the repository roots listed in a manifest file, one per line.
+    Blank lines and lines starting with # are ignored, relative roots are
+    relative to the manifest.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    roots = []
+    with open(manifest_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            roots.append(os.path.join(base_dir, line))
+    return roots
+
+
+def lint_repository(root, no_autofix=False, cache_dir=None):
+    """
+    Lints the CODEOWNERS file of the repository at root, without changing
+    the working directory. Returns the report of the repository.
+    """
+    report = {
+        'root': root,
+        'codeowners_file': None,
+        'violations': [],
+        'error': None,
+    }
+    codeowners_file = find_codeowners_file(root)
+    if codeowners_file is None:
+        report['error'] = 'no CODEOWNERS file found'
+        return report
+    report['codeowners_file'] = os.path.relpath(codeowners_file, root)
+    options = LintOptions(cache_dir=cache_dir, root=root)
+    try:
+        violations = lint_codeowners_file(codeowners_file, no_autofix, options)
+    except Exception as e:
+        report['error'] = f'{type(e).__name__}: {e}'
+        return report
+    report['violations'] = violations.violation_error_messages
+    return report
+
+
+def _lint_repository_task(task):
+    return lint_repository(*task)
+
+
+def lint_repositories(roots, no_autofix=False, cache_dir=None, jobs=None):
+    """
+    Lints the repositories concurrently. Returns the aggregated report,
+    with the repositories in the order of roots.
+    """
+    tasks = [(root, no_autofix, cache_dir) for root in roots]
+    if jobs == 1 or len(tasks) <= 1:
+        repositories = [_lint_repository_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            repositories = list(executor.map(
+                _lint_repository_task, tasks, chunksize=4))
+    return {
+        'summary': {
+            'repositories': len(repositories),
+            'with_violations': sum(1 for report in repositories if report['violations']),
+            'errors': sum(1 for report in repositories if report['error']),
+        },
+        'repositories': repositories,
+    }
+
+
+def main():
+    args = _parse_arguments(sys.argv[1:])
+    roots = list(args.roots)
+    if args.manifest:
+        roots.extend(read_manifest(args.manifest))
+    report = lint_repositories(
+        roots,
+        no_autofix=args.no_autofix,
+        cache_dir=args.cache_dir,
+        jobs=args.jobs if args.jobs > 0 else None,
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    if report['summary']['with_violations'] or report['summary']['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import marshal
+import os
+
+from gitlab_codeowners_linter.git_index import get_index_path
+from gitlab_codeowners_linter.ignore import GITIGNORE_FILE
+from gitlab_codeowners_linter.ignore import IgnoreRules
+
+# The cache directory is trimmed to this size, least recently used first
+DEFAULT_MAX_CACHE_SIZE = 64 * 1024 * 1024
+_EXISTENCE_DIR = 'existence'
+_INCREMENTAL_DIR = 'incremental'
+_TRANSLATIONS_FILE = 'pattern_translations.json'
+_OWNERS_DIR = 'owners'
+# bumped when the layout of the owner index changes
+_OWNER_INDEX_VERSION = 1
+# the git index ends with a checksum of its whole content
+_INDEX_CHECKSUM_SIZE = 20
+
+
+def get_hash(value):
+    return hashlib.sha1(value.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def get_default_cache_dir():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'gitlab-codeowners-linter')
+
+
+def _write_json(directory, file_path, content):
+    return _write_bytes(directory, file_path, json.dumps(content).encode())
+
+
+def _write_bytes(directory, file_path, data):
+    import tempfile
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except OSError:
+        # the cache is only an optimization, never fail the lint for it
+        return False
+    return True
+
+
+def get_tree_fingerprint(root='.', exclude=()):
+    """
+    Returns a digest identifying the set of files under root: the checksum
+    of the git index in git work trees (its inode, mtime and size when git
+    does not write the checksum), otherwise the mtime of every
+    directory walked (a directory mtime changes when a file is added or
+    removed) and the content of the .gitignore files deciding which
+    directories are walked
+    exclude: gitignore-style patterns of the directories not walked
+    """
+    digest = hashlib.sha1(os.path.abspath(root).encode(
+        'utf-8', 'surrogateescape'))
+    index_path = get_index_path(root)
+    if index_path is not None:
+        with open(index_path, 'rb') as f:
+            f.seek(-_INDEX_CHECKSUM_SIZE, os.SEEK_END)
+            checksum = f.read()
+            if checksum == bytes(_INDEX_CHECKSUM_SIZE):
+                # index.skipHash (feature.manyFiles) leaves the checksum
+                # zeroed, the index is identified by its stat instead
+                stat = os.fstat(f.fileno())
+                checksum = (
+                    f'{stat.st_ino}\0{stat.st_mtime_ns}\0{stat.st_size}'
+                ).encode()
+            digest.update(b'git:' + checksum)
+        return digest.hexdigest()
+    # the ignored directories are not walked when linting, nor here
+    ignore = IgnoreRules(root, exclude)
+    root_length = len(os.path.join(root, ''))
+    for dirpath, dirs, files in os.walk(os.path.join(root, '')):
+        mtime = os.stat(dirpath).st_mtime_ns
+        digest.update(f'{dirpath}\0{mtime}\0'.encode(
+            'utf-8', 'surrogateescape'))
+        if GITIGNORE_FILE in files:
+            try:
+                with open(os.path.join(dirpath, GITIGNORE_FILE), 'rb') as f:
+                    digest.update(f.read() + b'\0')
+            except OSError:
+                pass
+        ignore.prune(dirpath[root_length:].rstrip(os.sep), dirs, files)
+    return digest.hexdigest()
+
+
+class ExistenceCache:
+    def __init__(self, cache_dir, max_size=DEFAULT_MAX_CACHE_SIZE):
+        """
+        cache_dir: directory where the results are stored
+        max_size: maximum size in bytes of the stored results
+        """
+        self.cache_dir = os.path.join(cache_dir, _EXISTENCE_DIR)
+        self.max_size = max_size
+
+    def _get_file(self, fingerprint):
+        return os.path.join(self.cache_dir, f'{fingerprint}.json')
+
+    def load(self, fingerprint, patterns):
+        """
+        Returns the cached results of the patterns for the file set
+        identified by fingerprint: a dict mapping each known pattern to the
+        first file it matched, or None if it matched no file
+        """
+        cache_file = self._get_file(fingerprint)
+        try:
+            with open(cache_file) as f:
+                stored = json.load(f)
+            # refresh the entry for the least recently used eviction
+            os.utime(cache_file)
+        except (OSError, ValueError):
+            return {}
+        results = {}
+        for pattern in patterns:
+            key = get_hash(pattern)
+            if key in stored:
+                results[pattern] = stored[key]
+        return results
+
+    def store(self, fingerprint, results):
+        """
+        Adds results, a dict mapping patterns to the first file they matched
+        or None, to the results stored for the file set fingerprint
+        """
+        cache_file = self._get_file(fingerprint)
+        try:
+            with open(cache_file) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        stored.update(
+            (get_hash(pattern), witness) for pattern, witness in results.items())
+        if _write_json(self.cache_dir, cache_file, stored):
+            self._evict()
+
+    def _evict(self):
+        cache_files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    cache_files.append(
+                        (stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in cache_files)
+        for _, size, path in sorted(cache_files):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+
+class IncrementalState:
+    def __init__(self, cache_dir, root='.'):
+        """
+        cache_dir: directory where the state is stored
+        root: work tree the state belongs to
+        """
+        self.cache_dir = os.path.join(cache_dir, _INCREMENTAL_DIR)
+        self.state_file = os.path.join(
+            self.cache_dir, f'{get_hash(os.path.abspath(root))}.json')
+
+    def load(self):
+        """
+        Returns the fingerprint of the file set of the previous run and a
+        dict mapping the paths checked in the previous run to the first file
+        they matched, or None if they matched no file
+        """
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+            return state['fingerprint'], state['paths']
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, {}
+
+    def store(self, fingerprint, results):
+        _write_json(self.cache_dir, self.state_file, {
+            'fingerprint': fingerprint,
+            'paths': results,
+        })
+
+
+def _get_pathspec_version():
+    from importlib import metadata
+    try:
+        return metadata.version('pathspec')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+
+def load_pattern_translations(cache_dir):
+    """
+    Returns the gitwildmatch translations saved in cache_dir, as long as
+    they were made by the installed pathspec version
+    """
+    try:
+        with open(os.path.join(cache_dir, _TRANSLATIONS_FILE)) as f:
+            stored = json.load(f)
+        if stored['pathspec'] != _get_pathspec_version():
+            return {}
+        return stored['translations']
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def store_pattern_translations(cache_dir, translations):
+    _write_json(cache_dir, os.path.join(cache_dir, _TRANSLATIONS_FILE), {
+        'pathspec': _get_pathspec_version(),
+        'translations': translations,
+    })
+
+
+def _get_owner_index_path(cache_dir, snapshot_path):
+    return os.path.join(
+        cache_dir, _OWNERS_DIR, get_hash(os.path.abspath(snapshot_path)))
+
+
+def _get_snapshot_key(snapshot_path):
+    stat = os.stat(snapshot_path)
+    return (_OWNER_INDEX_VERSION, stat.st_mtime_ns, stat.st_size)
+
+
+def load_owner_index(cache_dir, snapshot_path):
+    """
+    Returns the owners of the snapshot file saved in cache_dir, or None if
+    they were not saved or the snapshot changed since
+    """
+    try:
+        with open(_get_owner_index_path(cache_dir, snapshot_path), 'rb') as f:
+            key, owners = marshal.loads(f.read())
+        if key != _get_snapshot_key(snapshot_path):
+            return None
+        return owners
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def store_owner_index(cache_dir, snapshot_path, owners):
+    """
+    Saves the owners read from the snapshot file in cache_dir, in a binary
+    format much faster to load than a JSON or CSV export
+    """
+    try:
+        key = _get_snapshot_key(snapshot_path)
+    except OSError:
+        return False
+    index_path = _get_owner_index_path(cache_dir, snapshot_path)
+    return _write_bytes(
+        os.path.dirname(index_path), index_path,
+        marshal.dumps((key, tuple(owners))))
@@ -1,12 +1,33 @@
 from __future__ import annotations
 
 import os
-from functools import cmp_to_key
-
-from pathspec import PathSpec
-
-from gitlab_codeowners_linter.sorting import sort_paths
-from gitlab_codeowners_linter.sorting import sort_section_names
+import sys
+
+from gitlab_codeowners_linter import profiling
+from gitlab_codeowners_linter.cache import ExistenceCache
+from gitlab_codeowners_linter.cache import get_hash
+from gitlab_codeowners_linter.cache import get_tree_fingerprint
+from gitlab_codeowners_linter.cache import IncrementalState
+from gitlab_codeowners_linter.cache import load_pattern_translations
+from gitlab_codeowners_linter.cache import store_pattern_translations
+from gitlab_codeowners_linter.coverage import compute_coverage
+from gitlab_codeowners_linter.git_index import get_index_path
+from gitlab_codeowners_linter.git_index import read_tracked_files
+from gitlab_codeowners_linter.ignore import IgnoreRules
+from gitlab_codeowners_linter.matching import compile_pattern
+from gitlab_codeowners_linter.matching import find_existing
+from gitlab_codeowners_linter.matching import LITERAL
+from gitlab_codeowners_linter.matching import PatternIndex
+from gitlab_codeowners_linter.matching import translation_cache
+from gitlab_codeowners_linter.parser import CodeownerSection
+from gitlab_codeowners_linter.parser import iter_codeowners
+from gitlab_codeowners_linter.probe import FileProbe
+from gitlab_codeowners_linter.resolver import OwnershipResolver
+from gitlab_codeowners_linter.rules import BUILTIN_RULES
+from gitlab_codeowners_linter.rules import FILES
+from gitlab_codeowners_linter.rules import select_rules
+from gitlab_codeowners_linter.sorting import path_sort_key
+from gitlab_codeowners_linter.sorting import section_sort_key
 
 
 class CodeownersViolations:
@@ -19,133 +40,601 @@ class CodeownersViolations:
         self.sections_with_non_existing_paths = []
         self.non_existing_paths = {}
         self.duplicated_sections = []
+        self.sections_with_shadowed_entries = []
+        self.shadowed_entries = {}
+        self.coverage = None
+        # line ranges of the file changed by autofix
+        self.changed_line_ranges = []
+        # (section, entry, owner, suggested owner or None) of every owner
+        # missing from the owners snapshot
+        self.unknown_owners = []
+        # (rule id, message, section, entry) of the plugin rules
+        self.plugin_violations = []
+        # report.Violation records, only built for structured output
+        self.records = []
+
+
+class CodeownersScan:
+    """
+    Evaluates the formatting rules in a single forward pass: sections and
+    their entries are fed in file order and every rule is updated at once.
+    """
+
+    def __init__(self, collect_paths=True):
+        """
+        collect_paths: keep the candidate paths for the existence check,
+        without them the memory used does not grow with the number of entries
+        """
+        self.collect_paths = collect_paths
+        self.empty = True
+        self.section_names_sorted = False
+        self.duplicated_sections = []
+        self.sections_with_blank_lines = []
+        self.unsorted_paths_in_sections = []
+        self.sections_with_duplicate_paths = []
+        # candidate paths for the existence check, in order of appearance
+        self.paths = {}
+        self._section_count = 0
+        self._section_names = set()
+        self._previous_section_key = None
+        self._section = None
+
+    def add_section(self, section):
+        self._finish_section()
+        self._section_count += 1
+        name = section.codeowner_section
+        if name.startswith('^'):
+            name = name[1:]
+        if name.lower() in self._section_names:
+            self.duplicated_sections.append(name)
+        self._section_names.add(name.lower())
+        # the first (default) section is not part of the ordering
+        if self._section_count > 1:
+            key = section_sort_key(section)
+            if self._previous_section_key is not None and self._previous_section_key > key:
+                self.section_names_sorted = True
+            self._previous_section_key = key
+        self._section = section
+        self._seen_paths = set()
+        self._previous_path_key = None
+        self._has_blank_lines = False
+        self._is_unsorted = False
+        self._has_duplicate_paths = False
+
+    def add_entry(self, entry):
+        path = entry.path
+        self.empty = False
+        if path in self._seen_paths:
+            self._has_duplicate_paths = True
+        else:
+            self._seen_paths.add(path)
+        if path == '':
+            # blank lines are reported on their own, they do not affect the order
+            self._has_blank_lines = True
+        else:
+            key = path_sort_key(entry)
+            if self._previous_path_key is not None and self._previous_path_key > key:
+                self._is_unsorted = True
+            self._previous_path_key = key
+            if self.collect_paths:
+                self.paths[path] = None
+
+    def _finish_section(self):
+        if self._section is None:
+            return
+        name = self._section.codeowner_section
+        if self._has_blank_lines:
+            self.sections_with_blank_lines.append(name)
+        if self._is_unsorted:
+            self.unsorted_paths_in_sections.append(name)
+        if self._has_duplicate_paths:
+            self.sections_with_duplicate_paths.append(name)
+        self._section = None
+
+    def finish(self):
+        self._finish_section()
+        return self
+
+
+def scan_codeowners(codeowners_data):
+    scan = CodeownersScan()
+    for section in codeowners_data:
+        scan.add_section(section)
+        for entry in section.entries:
+            scan.add_entry(entry)
+    return scan.finish()
 
 
-def check(codeowners_data):
+def check_stream(source):
+    """
+    Checks the formatting rules that only need a forward scan (all but the
+    existence of paths) while parsing source, see parser.iter_codeowners
+    """
     violations = CodeownersViolations()
+    scan = CodeownersScan(collect_paths=False)
+    for item in iter_codeowners(source):
+        if isinstance(item, CodeownerSection):
+            scan.add_section(item)
+        else:
+            scan.add_entry(item)
+    scan.finish()
+    if not scan.empty:
+        _add_formatting_violations(violations, scan)
+    return violations
 
-    if _is_codeowners_empty(codeowners_data):
-        return violations
-
-    # Are custom section names sorted?
-    sort_sections_names_key = cmp_to_key(sort_section_names)
-    if codeowners_data[1:] != sorted(codeowners_data[1:], key=sort_sections_names_key):
-        violations.violation_error_messages.append('Sections are not sorted')
-        violations.section_names_sorted = True
 
-    # Are there duplicated sections?
-    violations.duplicated_sections = _get_duplicated_sections(codeowners_data)
-    if violations.duplicated_sections != []:
-        violations.violation_error_messages.append(
-            f"The sections {', '.join(map(str, violations.duplicated_sections))} are duplicates",
-        )
+def check(codeowners_data, options=None):
+    violations = CodeownersViolations()
 
-    # Are there blank lines in sections?
-    violations.sections_with_blank_lines = _get_sections_with_blank_lines(
-        codeowners_data)
-    if violations.sections_with_blank_lines != []:
-        violations.violation_error_messages.append(
-            f"There are blank lines in the sections {', '.join(map(str, violations.sections_with_blank_lines))}",
-        )
+    with profiling.phase('formatting_rules') as phase:
+        scan = scan_codeowners(codeowners_data)
+        phase.count('entries', sum(
+            len(section.entries) for section in codeowners_data))
+    if scan.empty:
+        return violations
 
-    # Are there unsorted paths in sections?
-    violations.unsorted_paths_in_sections = _get_unsorted_paths_in_sections(
-        codeowners_data)
-    if violations.unsorted_paths_in_sections != []:
-        violations.violation_error_messages.append(
-            f"The paths in sections {', '.join(map(str, violations.unsorted_paths_in_sections))} are not sorted",
-        )
+    rules = _get_rules(options)
+    _add_formatting_violations(violations, scan, rules)
 
-    # Are there duplicated paths?
-    violations.sections_with_duplicate_paths = _get_sections_with_duplicate_paths(
-        codeowners_data)
-    if violations.sections_with_duplicate_paths != []:
-        violations.violation_error_messages.append(
-            f"The sections {', '.join(map(str, violations.sections_with_duplicate_paths))} have duplicate paths",
-        )
+    resolver = None
+    matrix = None
+    existing_paths = None
+    if 'shadowed-entry' in rules:
+        # one pass over the files answers both the existence of the paths
+        # and which entries apply to them
+        resolver, matrix = _get_match_matrix(codeowners_data, options)
+        existing_paths = matrix.existing()
 
     # Do paths exist?
-    violations.sections_with_non_existing_paths, violations.non_existing_paths = _get_non_existing_paths(
-        codeowners_data)
-    if violations.sections_with_non_existing_paths != []:
-        violations.violation_error_messages.append(
-            f"The sections {', '.join(map(str, violations.sections_with_non_existing_paths))} have non-existing paths",
-        )
+    if 'non-existing-path' in rules:
+        violations.sections_with_non_existing_paths, violations.non_existing_paths = _get_non_existing_paths(
+            codeowners_data, options, list(scan.paths), existing_paths)
+        if violations.sections_with_non_existing_paths != []:
+            violations.violation_error_messages.append(
+                f"The sections {', '.join(map(str, violations.sections_with_non_existing_paths))} have non-existing paths",
+            )
+
+    # Are there entries overridden by later entries?
+    if matrix is not None:
+        violations.sections_with_shadowed_entries, violations.shadowed_entries = _get_shadowed_entries(
+            codeowners_data, resolver, matrix)
+        if violations.sections_with_shadowed_entries != []:
+            violations.violation_error_messages.append(
+                f"The sections {', '.join(map(str, violations.sections_with_shadowed_entries))} have entries overridden by later entries",
+            )
+
+    # Do enough files have an owner?
+    if 'coverage' in rules and options is not None:
+        violations.coverage = _get_coverage(codeowners_data, options)
+        if options.min_coverage is not None and violations.coverage < options.min_coverage:
+            violations.violation_error_messages.append(
+                f'{violations.coverage:.2f}% of the files are matched by a path, below the minimum of {options.min_coverage:g}%',
+            )
+
+    # Are the owners known users and groups?
+    if 'unknown-owner' in rules and options is not None and options.owners_snapshot is not None:
+        violations.unknown_owners = _get_unknown_owners(
+            codeowners_data, options)
+        if violations.unknown_owners != []:
+            violations.violation_error_messages.append(
+                f"The owners {', '.join(_describe_unknown_owners(violations.unknown_owners))} are unknown",
+            )
+
+    plugin_rules = [rule for rule in rules.values() if rule.check is not None]
+    if plugin_rules:
+        _add_plugin_violations(
+            violations, codeowners_data, plugin_rules, options)
 
     return violations
 
 
-def _is_codeowners_empty(codeowners_data):
-    empty = False
-    if all(not section.get_paths() for section in codeowners_data):
-        empty = True
-    return empty
+def _add_formatting_violations(violations, scan, rules=BUILTIN_RULES):
+    # Are custom section names sorted?
+    if 'unsorted-sections' in rules:
+        violations.section_names_sorted = scan.section_names_sorted
+        if violations.section_names_sorted:
+            violations.violation_error_messages.append(
+                'Sections are not sorted')
 
+    # Are there duplicated sections?
+    if 'duplicated-section' in rules:
+        violations.duplicated_sections = scan.duplicated_sections
+        if violations.duplicated_sections != []:
+            violations.violation_error_messages.append(
+                f"The sections {', '.join(map(str, violations.duplicated_sections))} are duplicates",
+            )
 
-def _get_duplicated_sections(codeowners_data):
-    all_sections_name = list(
-        section.codeowner_section for section in codeowners_data)
-    all_sections_name = [x.split('^')[1] if x.startswith(
-        '^') else x for x in all_sections_name]
-    seen = set()
-    return [x for x in all_sections_name if x.lower() in seen or seen.add(x.lower())]
+    # Are there blank lines in sections?
+    if 'blank-line' in rules:
+        violations.sections_with_blank_lines = scan.sections_with_blank_lines
+        if violations.sections_with_blank_lines != []:
+            violations.violation_error_messages.append(
+                f"There are blank lines in the sections {', '.join(map(str, violations.sections_with_blank_lines))}",
+            )
 
+    # Are there unsorted paths in sections?
+    if 'unsorted-paths' in rules:
+        violations.unsorted_paths_in_sections = scan.unsorted_paths_in_sections
+        if violations.unsorted_paths_in_sections != []:
+            violations.violation_error_messages.append(
+                f"The paths in sections {', '.join(map(str, violations.unsorted_paths_in_sections))} are not sorted",
+            )
 
-def _get_sections_with_blank_lines(codeowners_data):
-    sections_with_blank_lines = []
-    for section in codeowners_data:
-        if '' in section.get_paths():
-            sections_with_blank_lines.append(section.codeowner_section)
-    return sections_with_blank_lines
+    # Are there duplicated paths?
+    if 'duplicated-path' in rules:
+        violations.sections_with_duplicate_paths = scan.sections_with_duplicate_paths
+        if violations.sections_with_duplicate_paths != []:
+            violations.violation_error_messages.append(
+                f"The sections {', '.join(map(str, violations.sections_with_duplicate_paths))} have duplicate paths",
+            )
+
+
+def _add_plugin_violations(violations, codeowners_data, plugin_rules, options):
+    files = None
+    for rule in plugin_rules:
+        if rule.tier == FILES and files is None:
+            files = _get_files(options)
+        with profiling.phase(rule.id):
+            for message, section, entry in rule.check(
+                    codeowners_data, files if rule.tier == FILES else None):
+                violations.plugin_violations.append(
+                    (rule.id, message, section, entry))
+                violations.violation_error_messages.append(message)
+
+
+def _get_unknown_owners(codeowners_data, options):
+    """
+    Returns (section, entry, owner, suggestion) for every owner of an entry
+    missing from the snapshot of options, with the closest known owner
+    """
+    # only loaded when the owners are checked
+    from gitlab_codeowners_linter.owners import load_owner_directory
+    directory = load_owner_directory(
+        options.owners_snapshot, options.cache_dir)
+    suggestions = {}
+    unknown_owners = []
+    with profiling.phase('owners') as phase:
+        for section in codeowners_data:
+            for entry in section.entries:
+                for owner in entry.owners:
+                    if owner.startswith('#'):
+                        # a trailing comment
+                        break
+                    phase.count('owners', 1)
+                    if directory.is_known(owner):
+                        continue
+                    if owner not in suggestions:
+                        suggestions[owner] = directory.suggest(owner)
+                    unknown_owners.append(
+                        (section, entry, owner, suggestions[owner]))
+    return unknown_owners
+
+
+def _describe_unknown_owners(unknown_owners):
+    descriptions = {}
+    for _, _, owner, suggestion in unknown_owners:
+        if owner in descriptions:
+            continue
+        if suggestion is None:
+            descriptions[owner] = owner
+        else:
+            descriptions[owner] = f'{owner} (did you mean {suggestion}?)'
+    return descriptions.values()
 
 
-def _get_unsorted_paths_in_sections(codeowners_data):
-    unsorted_sections = []
-    sort_paths_key = cmp_to_key(sort_paths)
-    for section in codeowners_data:
-        if sorted(section.entries, key=sort_paths_key) != section.entries:
-            unsorted_sections.append(section.codeowner_section)
-    return unsorted_sections
+def _get_rules(options):
+    """
+    Returns the rules selected by options, by id
+    """
+    if options is None:
+        return select_rules()
+    enabled = []
+    if options.check_shadowed:
+        enabled.append('shadowed-entry')
+    if options.min_coverage is not None or options.coverage_report is not None:
+        enabled.append('coverage')
+    if options.owners_snapshot is not None:
+        enabled.append('unknown-owner')
+    return select_rules(options.select, options.ignore, enabled)
+
+
+def _get_all_filepaths(root='.', nested=False, exclude=()):
+    """
+    This function will return the file names tracked in the git index,
+    falling back to walking the directory tree outside of git work trees.
+    The file names are relative to root.
+    nested: include the files of the checked out git submodules
+    exclude: gitignore-style patterns of the files left out
+    """
+    with profiling.phase('enumerate_files') as phase:
+        ignore = IgnoreRules(root, exclude)
+        file_paths = read_tracked_files(root, nested)
+        if file_paths is None:
+            file_paths = _walk_filepaths(root, ignore)
+        elif exclude:
+            # ignored files are not in the index, only exclude applies
+            file_paths = [
+                path for path in file_paths if not ignore.is_excluded(path)]
+        phase.count('files', len(file_paths))
+    return file_paths
+
+
+def _get_files(options):
+    """
+    Returns the files under the root of options, enumerated unless options
+    already carry them
+    """
+    if options is None:
+        return _get_all_filepaths()
+    if options.files is not None:
+        return options.files
+    return _get_all_filepaths(options.root, exclude=options.exclude)
 
 
-def _get_sections_with_duplicate_paths(codeowners_data):
-    sections_with_duplicate_paths = []
-    for section in codeowners_data:
-        if len(set(section.get_paths())) != len(section.get_paths()):
-            sections_with_duplicate_paths.append(section.codeowner_section)
-    return sections_with_duplicate_paths
+def _iter_files(options):
+    """
+    Like _get_files, but outside of git work trees the tree is walked as the
+    files are consumed instead of being listed first
+    """
+    if options.files is not None:
+        return options.files
+    ignore = IgnoreRules(options.root, options.exclude)
+    file_paths = read_tracked_files(options.root)
+    if file_paths is None:
+        return _iter_filepaths(options.root, ignore)
+    if options.exclude:
+        return (path for path in file_paths if not ignore.is_excluded(path))
+    return file_paths
+
+
+def _walk_filepaths(root='.', ignore=None, directory=''):
+    """
+    This function will return the file names in a directory
+    tree by walking the tree, see _iter_filepaths
+    """
+    return list(_iter_filepaths(root, ignore, directory))
 
 
-def _get_all_filepaths():
+def _iter_filepaths(root='.', ignore=None, directory=''):
     """
     This function will generate the file names in a directory
-    tree by walking the tree
+    tree by walking the tree. The ignored directories are not descended
+    into.
+    ignore: IgnoreRules of root, its .gitignore files only if None
+    directory: only walk this directory of root, the file names stay
+    relative to root
     """
-    file_paths = []  # List which will store all of the full filepaths.
-
-    for root, _, files in os.walk('.'):
-        for filename in files:
+    # we ignore the root (e.g. ./) at the beginning of the paths
+    root_length = len(os.path.join(root, ''))
+    if ignore is None:
+        ignore = IgnoreRules(root)
+
+    for dirpath, dirs, files in os.walk(os.path.join(root, directory, '')):
+        relative_dirpath = dirpath[root_length:].rstrip(os.sep)
+        for filename in ignore.prune(relative_dirpath, dirs, files):
             # Join the two strings in order to form the full filepath.
-            filepath = os.path.join(root, filename)
-            # we ignore the ./ at the beginning of the path
-            file_paths.append(filepath[2:])
+            filepath = os.path.join(dirpath, filename)
+            yield filepath[root_length:]
 
-    return file_paths  # Self-explanatory.
 
+def _is_walked(options):
+    """
+    The files under the root of options are enumerated by walking the tree
+    """
+    if options is None:
+        return get_index_path() is None
+    return options.files is None and get_index_path(options.root) is None
 
-def _get_non_existing_paths(codeowners_data):
+
+def _probe_literal_paths(paths, root, ignore):
+    """
+    Returns a dict mapping the literal paths among paths to the first file
+    they match, or None
+    """
+    probe = FileProbe(root, ignore)
+    results = {}
+    with profiling.phase('probe') as phase:
+        for path in paths:
+            compiled = compile_pattern(path)
+            if compiled.kind == LITERAL:
+                results[path] = probe.first_file(
+                    compiled.body, compiled.dir_only)
+        phase.count('paths', len(results))
+        phase.count('directories', probe.listed_directories)
+    return results
+
+
+def _get_incremental_results(paths, options, files, fingerprint):
+    """
+    Reuses the results of the previous run for the paths whose outcome
+    cannot have changed. Returns the reused results.
+    """
+    previous_fingerprint, previous_results = IncrementalState(
+        options.cache_dir, options.root).load()
+    tracked = set(files)
+    changed_files = [
+        path for path in options.changed_files if path in tracked]
+    changed_index = PatternIndex(
+        path for path in paths if path in previous_results)
+    # files added or modified since the previous run are the only new
+    # candidates for paths that did not match anything before
+    changed_matches = changed_index.find_existing(changed_files)
+    results = {}
+    for path in paths:
+        if path not in previous_results:
+            # a path added to CODEOWNERS
+            continue
+        witness = previous_results[path]
+        if witness is not None and witness in tracked:
+            # the file the path matched is still there
+            results[path] = witness
+        elif path in changed_matches:
+            results[path] = changed_matches[path]
+        elif witness is None and fingerprint == previous_fingerprint:
+            results[path] = None
+    return results
+
+
+# cache directories whose pattern translations were loaded in this process
+_loaded_translations = set()
+
+
+def _load_pattern_translations(cache_dir):
+    if cache_dir in _loaded_translations:
+        return
+    translation_cache.update(load_pattern_translations(cache_dir))
+    _loaded_translations.add(cache_dir)
+
+
+def _get_existing_paths(paths, options):
+    """
+    Returns a dict mapping every path matching at least one file
+    to the first file it matched
+    """
+    if options is not None and options.file_index is not None:
+        return options.file_index.existing_paths(paths)
+    cache = None
+    fingerprint = None
+    files = None
+    cached_results = {}
+    new_results = {}
+    root = options.root if options is not None else '.'
+    if options is not None and options.cache_dir is not None:
+        with profiling.phase('cache') as phase:
+            _load_pattern_translations(options.cache_dir)
+            cache = ExistenceCache(options.cache_dir)
+            fingerprint = options.tree_fingerprint or get_tree_fingerprint(
+                root, options.exclude)
+            if options.exclude:
+                # the files checked depend on the exclude globs as well
+                fingerprint = get_hash(
+                    '\0'.join([fingerprint, *options.exclude]))
+            cached_results = cache.load(fingerprint, paths)
+            phase.count('hits', len(cached_results))
+    remaining = [path for path in paths if path not in cached_results]
+    if remaining and options is not None and options.incremental:
+        files = _get_files(options)
+        new_results = _get_incremental_results(
+            remaining, options, files, fingerprint)
+        remaining = [path for path in remaining if path not in new_results]
+    if remaining and files is None and _is_walked(options):
+        # without a file list, literal paths are probed on the file system
+        # and the tree is only walked, lazily, for the other ones
+        ignore = IgnoreRules(
+            root, options.exclude if options is not None else ())
+        new_results.update(_probe_literal_paths(remaining, root, ignore))
+        remaining = [path for path in remaining if path not in new_results]
+        if remaining and (options is None or options.jobs <= 1):
+            files = _iter_filepaths(root, ignore)
+    if remaining:
+        if files is None:
+            files = _get_files(options)
+        # a single index over all the paths, so that each file is
+        # classified once instead of being matched against every pattern
+        jobs = options.jobs if options is not None else 1
+        with profiling.phase('pattern_matching') as phase:
+            existing = find_existing(remaining, files, jobs)
+            phase.count('patterns', len(remaining))
+        new_results.update(
+            (path, existing.get(path)) for path in remaining)
+    if cache is not None and new_results:
+        with profiling.phase('cache'):
+            cache.store(fingerprint, new_results)
+            if translation_cache.modified:
+                store_pattern_translations(
+                    options.cache_dir, dict(translation_cache.translations))
+                translation_cache.modified = False
+    results = {**cached_results, **new_results}
+    if options is not None and options.incremental:
+        IncrementalState(options.cache_dir, root).store(
+            fingerprint, {path: results[path] for path in paths})
+    return {path: file for path, file in results.items() if file is not None}
+
+
+def _get_match_matrix(codeowners_data, options):
+    """
+    Matches every file against all the paths of codeowners_data. Returns
+    the OwnershipResolver of codeowners_data and the MatchMatrix.
+    """
+    resolver = OwnershipResolver(codeowners_data)
+    files = _get_files(options)
+    with profiling.phase('match_matrix') as phase:
+        matrix = resolver.index.match_matrix(files)
+        phase.count('files_scanned', resolver.index.files_scanned)
+        phase.count('regex_evaluations', resolver.index.regex_evaluations)
+        phase.count('rows', len(matrix.rows))
+    return resolver, matrix
+
+
+def _get_coverage(codeowners_data, options):
+    """
+    Returns the percentage of the files matched by a path, writing the
+    coverage report if options ask for one
+    """
+    files = _iter_files(options)
+    with profiling.phase('coverage') as phase:
+        if options.coverage_report is None:
+            report = compute_coverage(
+                codeowners_data, files, options.coverage_depth)
+        elif options.coverage_report == '-':
+            report = compute_coverage(
+                codeowners_data, files, options.coverage_depth, sys.stdout, options.coverage_prefix)
+        elif hasattr(options.coverage_report, 'write'):
+            report = compute_coverage(
+                codeowners_data, files, options.coverage_depth, options.coverage_report, options.coverage_prefix)
+        else:
+            with open(options.coverage_report, 'w') as stream:
+                report = compute_coverage(
+                    codeowners_data, files, options.coverage_depth, stream, options.coverage_prefix)
+        phase.count('files', report.files)
+        phase.count('uncovered', report.uncovered)
+    return report.coverage
+
+
+def _get_shadowed_entries(codeowners_data, resolver, matrix):
+    """
+    Returns the sections with entries matching files but applying to none
+    of them, and these entries per section
+    """
+    winning_entries = set()
+    for patterns, _, _ in matrix.iter_rows():
+        winning_entries.update(
+            id(ownership.entry) for ownership in resolver.resolve_patterns(patterns))
+    existing_paths = matrix.existing()
+    sections_with_shadowed_entries = []
+    shadowed_entries = {}
+    for section in codeowners_data:
+        shadowed_entries_in_section = [
+            entry.path for entry in section.entries
+            if entry.path in existing_paths and id(entry) not in winning_entries
+        ]
+        if shadowed_entries_in_section:
+            sections_with_shadowed_entries.append(section.codeowner_section)
+        shadowed_entries.setdefault(section.codeowner_section.lower(), []).extend(
+            shadowed_entries_in_section)
+    return sections_with_shadowed_entries, shadowed_entries
+
+
+def _get_non_existing_paths(codeowners_data, options=None, paths=None, existing_paths=None):
+    """
+    existing_paths: the paths known to exist mapped to a file they match,
+    looked up if None
+    """
     sections_with_non_existing_paths = []
     non_existing_paths = {}
-    files = _get_all_filepaths()
+    if paths is None:
+        paths = list(dict.fromkeys(
+            entry.path for section in codeowners_data for entry in section.entries if entry.path))
+    with profiling.phase('existence') as phase:
+        if existing_paths is None:
+            existing_paths = _get_existing_paths(paths, options)
+        phase.count('paths', len(paths))
     for section in codeowners_data:
-        spec = PathSpec.from_lines(
-            'gitwildmatch', list(section.get_paths()))
-        data = list(zip(section.get_paths(), spec.patterns))
-        non_existing_paths_in_section = []
-        for path, pattern in data:
-            match = list(filter(pattern.regex.match, files))
-            if not match:
-                non_existing_paths_in_section.append(path)
+        # blank lines are reported by their own rule
+        non_existing_paths_in_section = [
+            entry.path for entry in section.entries
+            if entry.path and entry.path not in existing_paths
+        ]
         if non_existing_paths_in_section:
             sections_with_non_existing_paths.append(
                 section.codeowner_section)
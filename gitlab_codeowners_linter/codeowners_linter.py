@@ -10,50 +10,238 @@
 #
 from __future__ import annotations
 
-import logging
+import copy
+import os
 import sys
 
-from gitlab_codeowners_linter.autofix import fix
+from gitlab_codeowners_linter import profiling
+from gitlab_codeowners_linter.cache import get_hash
+from gitlab_codeowners_linter.cache import get_tree_fingerprint
+from gitlab_codeowners_linter.checks import _get_all_filepaths
 from gitlab_codeowners_linter.checks import check
-from gitlab_codeowners_linter.input import get_arguments
+from gitlab_codeowners_linter.constants import VALID_CODEOWNERS_PATHS
+from gitlab_codeowners_linter.input import get_options
 from gitlab_codeowners_linter.parser import parse_codeowners
+from gitlab_codeowners_linter.report import iter_violations
+from gitlab_codeowners_linter.report import WRITERS
 
-# TODO: manage logging level via args
-logging.basicConfig(level=logging.ERROR)
+
+def _get_logger():
+    # logging is only loaded when there is something to report
+    import logging
+    # TODO: manage logging level via args
+    logging.basicConfig(level=logging.ERROR)
+    return logging
 
 
 class OwnersList:
-    def __init__(self, file_path, no_autofix):
+    def __init__(self, file_path, no_autofix, options=None):
         """
         file_path: path of the CODEOWNERS file
+        options: LintOptions tuning how the checks run
         """
         self.file_path = file_path
         self.codeowners_data = parse_codeowners(self.file_path)
         self.autofix = not no_autofix
+        self.options = options
 
     def lint(self):
-        violations = check(self.codeowners_data)
+        violations = check(self.codeowners_data, self.options)
+        if self.options is not None and self.options.output_format != 'text':
+            violations.records = iter_violations(
+                self.codeowners_data, violations, str(self.file_path), self.options.min_coverage)
+            if self.autofix:
+                # autofix reorders the entries the records are built from
+                violations.records = list(violations.records)
         if self.autofix:
-            fix(self.codeowners_data, violations, self.file_path)
+            # only loaded when needed, it is not on the path of clean runs
+            from gitlab_codeowners_linter.autofix import fix
+            with profiling.phase('autofix'):
+                violations.changed_line_ranges = fix(
+                    self.codeowners_data, violations, self.file_path)
         return violations
 
 
-def lint_codeowners_file(codeowners_file, no_autofix):
-    codeowners = OwnersList(codeowners_file, no_autofix)
+def lint_codeowners_file(codeowners_file, no_autofix, options=None):
+    codeowners = OwnersList(codeowners_file, no_autofix, options)
     return codeowners.lint()
 
 
+def _find_projects(files):
+    """
+    Returns (CODEOWNERS file, project root) for every directory with a
+    CODEOWNERS file among files, at the first of VALID_CODEOWNERS_PATHS
+    present. The top directory is ''.
+    """
+    # a docs/CODEOWNERS file belongs to the parent of docs, longest first
+    codeowners_paths = sorted(
+        VALID_CODEOWNERS_PATHS, key=lambda path: -len(path))
+    priorities = {path: i for i, path in enumerate(VALID_CODEOWNERS_PATHS)}
+    projects = {}
+    for path in files:
+        if not path.endswith('CODEOWNERS'):
+            continue
+        for codeowners_path in codeowners_paths:
+            if path == codeowners_path or path.endswith('/' + codeowners_path):
+                root = path[:len(path) - len(codeowners_path)].rstrip('/')
+                if root not in projects or priorities[codeowners_path] < projects[root][0]:
+                    projects[root] = (priorities[codeowners_path], path)
+                break
+    return [(projects[root][1], root) for root in sorted(projects)]
+
+
+def _scope_files(files, roots):
+    """
+    Returns a dict mapping every root to the files under it, relative to it
+    """
+    scoped_files = {root: [] for root in roots}
+    top_files = scoped_files.get('')
+    for path in files:
+        if top_files is not None:
+            top_files.append(path)
+        end = path.find('/')
+        while end != -1:
+            root_files = scoped_files.get(path[:end])
+            if root_files is not None:
+                root_files.append(path[end + 1:])
+            end = path.find('/', end + 1)
+    return scoped_files
+
+
+def lint_all_codeowners_files(no_autofix, options):
+    """
+    Lints every CODEOWNERS file under options.root, each against the files
+    of its own directory. The files are enumerated once for all of them.
+    Returns a dict mapping the CODEOWNERS files to their violations.
+    """
+    files = _get_all_filepaths(
+        options.root, nested=True, exclude=options.exclude)
+    projects = _find_projects(files)
+    roots = [root for _, root in projects]
+    scoped_files = _scope_files(files, roots)
+    scoped_changed_files = _scope_files(
+        [path.replace(os.sep, '/') for path in options.changed_files], roots)
+    fingerprint = None
+    if options.cache_dir is not None:
+        fingerprint = get_tree_fingerprint(options.root, options.exclude)
+    coverage_report = options.coverage_report
+    if coverage_report is not None and coverage_report != '-':
+        # the projects write one report, with paths relative to options.root
+        coverage_report = open(coverage_report, 'w')
+    results = {}
+    try:
+        for codeowners_file, root in projects:
+            project_options = copy.copy(options)
+            project_options.root = os.path.join(options.root, root)
+            project_options.files = scoped_files[root]
+            project_options.changed_files = scoped_changed_files[root]
+            project_options.coverage_report = coverage_report
+            project_options.coverage_prefix = f'{root}/' if root else ''
+            if fingerprint is not None:
+                project_options.tree_fingerprint = get_hash(
+                    f'{fingerprint}\0{root}')
+            codeowners_file = os.path.join(options.root, codeowners_file)
+            results[codeowners_file] = lint_codeowners_file(
+                codeowners_file, no_autofix, project_options)
+    finally:
+        if coverage_report is not options.coverage_report:
+            coverage_report.close()
+    return results
+
+
+def _format_line_ranges(line_ranges):
+    return ', '.join(
+        str(first) if first == last else f'{first}-{last}'
+        for first, last in line_ranges
+    )
+
+
+def _use_daemon(options):
+    """
+    The daemon lints with its own LintOptions, checking the default rules
+    only, and profiling measures the work done in this process: the options
+    changing either make the lint run in-process
+    """
+    return (
+        options.daemon and options.profile is None and options.output_format == 'text'
+        and options.select is None and not options.ignore and options.owners_snapshot is None
+        and not options.check_shadowed
+        and options.min_coverage is None and options.coverage_report is None
+        and not options.exclude
+    )
+
+
+def _lint(codeowners_file, no_autofix, options):
+    """
+    Returns the violation messages, the changed line ranges and the
+    violation records of every CODEOWNERS file linted
+    """
+    if options.all_codeowners:
+        results = lint_all_codeowners_files(no_autofix, options)
+        return {
+            codeowners_file: (
+                violations.violation_error_messages,
+                violations.changed_line_ranges,
+                violations.records,
+            )
+            for codeowners_file, violations in results.items()
+        }
+    if _use_daemon(options):
+        # the socket module is only loaded to reach a daemon
+        from gitlab_codeowners_linter.daemon_client import request_lint
+        response = request_lint(
+            codeowners_file, no_autofix, options.root)
+        if response is not None:
+            return {codeowners_file: (*response, [])}
+    violations = lint_codeowners_file(codeowners_file, no_autofix, options)
+    return {codeowners_file: (violations.violation_error_messages, violations.changed_line_ranges, violations.records)}
+
+
+def _write_records(results, options):
+    records = (
+        record for _, _, file_records in results.values() for record in file_records)
+    write = WRITERS[options.output_format]
+    if options.output is None:
+        write(records, sys.stdout)
+    else:
+        with open(options.output, 'w') as f:
+            write(records, f)
+
+
 def main():
-    codeowners_file, no_autofix = get_arguments(sys.argv[1:])
-    if codeowners_file == None:
-        logging.debug(
+    codeowners_file, no_autofix, options = get_options(sys.argv[1:])
+    if codeowners_file == None and not options.all_codeowners:
+        _get_logger().debug(
             'You did not provide a valid CODEOWNERS path, you can use a positional argument or the flag --codeowners_file. Please refer to the README for more info')
         sys.exit(0)
-    violations = lint_codeowners_file(
-        codeowners_file, no_autofix)
-    if violations.violation_error_messages:
-        logging.error(
-            'There are the following linting violations: %s', violations.violation_error_messages)
+    if options.profile is not None:
+        profiler = profiling.enable()
+    results = _lint(codeowners_file, no_autofix, options)
+    if options.profile is not None:
+        profiling.disable()
+        if options.profile == '-':
+            profiler.write_table(sys.stderr)
+        else:
+            profiler.write_json(options.profile)
+    if options.output_format != 'text':
+        _write_records(results, options)
+    failed = False
+    for codeowners_file, (violation_error_messages, changed_line_ranges, _) in results.items():
+        if changed_line_ranges:
+            _get_logger().error('Fixed the lines %s of %s', _format_line_ranges(
+                changed_line_ranges), codeowners_file)
+        if not violation_error_messages:
+            continue
+        failed = True
+        if options.output_format != 'text':
+            continue
+        if options.all_codeowners:
+            _get_logger().error(
+                'There are the following linting violations in %s: %s', codeowners_file, violation_error_messages)
+        else:
+            _get_logger().error(
+                'There are the following linting violations: %s', violation_error_messages)
+    if failed:
         sys.exit(1)
 
 
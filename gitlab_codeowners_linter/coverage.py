@@ -0,0 +1,101 @@
+# Ownership coverage of the files of a repository: the files matched by no
+# CODEOWNERS path, counted per directory in a single pass over the files.
+from __future__ import annotations
+
+import json
+
+from gitlab_codeowners_linter.matching import PatternIndex
+
+# Directories deeper than this are counted in their ancestor at this depth,
+# so that the memory used does not grow with the size of the tree
+DEFAULT_COVERAGE_DEPTH = 3
+
+
+def _percentage(files, uncovered):
+    if files == 0:
+        return 100.0
+    return 100.0 * (files - uncovered) / files
+
+
+class CoverageReport:
+    def __init__(self, max_depth=DEFAULT_COVERAGE_DEPTH):
+        """
+        max_depth: depth of the deepest directories counted on their own
+        """
+        self.max_depth = max_depth
+        self.files = 0
+        self.uncovered = 0
+        # directory -> [number of files, number of uncovered files]
+        self.directories = {}
+
+    def add(self, path, covered):
+        self.files += 1
+        if not covered:
+            self.uncovered += 1
+        depth = 0
+        end = path.find('/')
+        while end != -1 and depth < self.max_depth:
+            counts = self.directories.get(path[:end])
+            if counts is None:
+                counts = self.directories[path[:end]] = [0, 0]
+            counts[0] += 1
+            if not covered:
+                counts[1] += 1
+            depth += 1
+            end = path.find('/', end + 1)
+
+    @property
+    def coverage(self):
+        """
+        Percentage of the files matched by at least one path
+        """
+        return _percentage(self.files, self.uncovered)
+
+    def iter_directories(self):
+        """
+        Yields (directory, number of files, number of uncovered files,
+        coverage percentage) for the whole tree ('.') then every directory
+        """
+        yield '.', self.files, self.uncovered, self.coverage
+        for directory in sorted(self.directories):
+            files, uncovered = self.directories[directory]
+            yield directory, files, uncovered, _percentage(files, uncovered)
+
+    def write_directories(self, stream, prefix=''):
+        """
+        prefix: prepended to the directories, '' or a directory ending with /
+        """
+        for directory, files, uncovered, coverage in self.iter_directories():
+            if prefix:
+                if directory == '.':
+                    directory = prefix.rstrip('/')
+                else:
+                    directory = prefix + directory
+            stream.write(json.dumps({
+                'directory': directory,
+                'files': files,
+                'uncovered': uncovered,
+                'coverage': round(coverage, 2),
+            }) + '\n')
+
+
+def compute_coverage(codeowners_data, files, max_depth=DEFAULT_COVERAGE_DEPTH, stream=None, prefix=''):
+    """
+    Matches every file against the paths of codeowners_data and returns the
+    CoverageReport. With a stream, every uncovered file is written to it as
+    a JSON line as soon as it is found, followed by the directory counts.
+    prefix: prepended to the paths written to stream, e.g. the directory of
+    the CODEOWNERS file when several files share one report
+    """
+    index = PatternIndex(
+        entry.path for section in codeowners_data for entry in section.entries
+        if entry.path)
+    report = CoverageReport(max_depth)
+    for path in files:
+        covered = index.matches_any(path)
+        report.add(path, covered)
+        if not covered and stream is not None:
+            stream.write(json.dumps({'uncovered': prefix + path}) + '\n')
+    if stream is not None:
+        report.write_directories(stream, prefix)
+    return report
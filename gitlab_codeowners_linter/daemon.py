@@ -0,0 +1,438 @@
+# Long-running linter for one checkout: the parsed CODEOWNERS files, the
+# file index and the path existence results are kept in memory and updated
+# from inotify events, and the CLI asks for the violations over a Unix
+# socket instead of linting in-process.
+from __future__ import annotations
+
+import argparse
+import ctypes.util
+import json
+import logging
+import os
+import selectors
+import socket
+import struct
+import sys
+import time
+
+from gitlab_codeowners_linter.autofix import fix
+from gitlab_codeowners_linter.cache import get_tree_fingerprint
+from gitlab_codeowners_linter.checks import _walk_filepaths
+from gitlab_codeowners_linter.checks import check
+from gitlab_codeowners_linter.constants import VALID_CODEOWNERS_PATHS
+from gitlab_codeowners_linter.daemon_client import DEFAULT_TIMEOUT
+from gitlab_codeowners_linter.daemon_client import get_socket_path
+from gitlab_codeowners_linter.daemon_client import is_private_directory
+from gitlab_codeowners_linter.daemon_client import read_message
+from gitlab_codeowners_linter.daemon_client import send_request
+from gitlab_codeowners_linter.git_index import find_git_dir
+from gitlab_codeowners_linter.git_index import read_tracked_files
+from gitlab_codeowners_linter.ignore import GITIGNORE_FILE
+from gitlab_codeowners_linter.ignore import IgnoreRules
+from gitlab_codeowners_linter.matching import find_existing
+from gitlab_codeowners_linter.matching import PatternIndex
+from gitlab_codeowners_linter.options import LintOptions
+from gitlab_codeowners_linter.parser import parse_codeowners
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+_DIRECTORY_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ONLYDIR
+_GIT_DIR_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR
+# struct inotify_event without its name
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """
+    Minimal ctypes binding of the Linux inotify API
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._rm_watch = libc.inotify_rm_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def fileno(self):
+        return self.fd
+
+    def add_watch(self, path, mask):
+        wd = self._add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def rm_watch(self, wd):
+        self._rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """
+        Returns the pending events as (wd, mask, name) tuples
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                events.append((wd, mask, os.fsdecode(name)))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _open_inotify():
+    try:
+        return Inotify()
+    except (AttributeError, OSError, TypeError):
+        # not on Linux, or no more inotify instances available
+        return None
+
+
+class FileIndex:
+    """
+    The files of a checkout and the existence results of the CODEOWNERS
+    paths, kept up to date between lint requests. The files are the ones
+    tracked in the git index, reloaded when git rewrites it, or all the
+    files under root outside of git work trees, followed directory by
+    directory. Without inotify the tree fingerprint is compared on every
+    request instead.
+    """
+
+    def __init__(self, root='.', inotify=None):
+        """
+        root: top of the file tree the CODEOWNERS paths are relative to
+        inotify: Inotify instance notifying the changes, None to poll
+        """
+        self.root = root
+        self.inotify = inotify
+        self.files = set()
+        # every path checked so far mapped to the first file it matched,
+        # or None if it matched no file
+        self.results = {}
+        self._added = set()
+        self._file_list = None
+        self._fingerprint = None
+        self._git_dir = find_git_dir(root)
+        self._ignore = IgnoreRules(root)
+        # watch descriptor -> directory relative to root
+        self._watches = {}
+        if self.inotify is not None and self._git_dir is not None:
+            self.inotify.add_watch(self._git_dir, _GIT_DIR_MASK)
+        self.rescan()
+
+    def fileno(self):
+        return self.inotify.fileno()
+
+    def rescan(self):
+        """
+        Enumerates all the files again
+        """
+        if self.inotify is None:
+            self._fingerprint = get_tree_fingerprint(self.root)
+        files = None
+        if self._git_dir is not None:
+            files = read_tracked_files(self.root)
+        if files is None:
+            self._ignore = IgnoreRules(self.root)
+            if self.inotify is not None:
+                for wd in self._watches:
+                    self.inotify.rm_watch(wd)
+                self._watches = {}
+                self._watch_tree('')
+            files = _walk_filepaths(self.root, self._ignore)
+        files = set(files)
+        self._apply_changes(files - self.files, self.files - files)
+
+    def _watch_tree(self, directory):
+        for dirpath, dirs, files in os.walk(os.path.join(self.root, directory)):
+            relative = os.path.relpath(dirpath, self.root)
+            self._ignore.prune(
+                '' if relative == '.' else relative, dirs, files)
+            try:
+                wd = self.inotify.add_watch(dirpath, _DIRECTORY_MASK)
+            except OSError:
+                # removed in the meantime, or out of watches
+                continue
+            self._watches[wd] = '' if relative == '.' else relative
+
+    def _apply_changes(self, added, removed):
+        if not added and not removed:
+            return
+        self.files -= removed
+        self.files |= added
+        self._file_list = None
+        self._added -= removed
+        self._added |= added
+        if removed:
+            # the paths whose file is gone are checked again when requested
+            self.results = {
+                path: file for path, file in self.results.items()
+                if file not in removed
+            }
+
+    def process_events(self):
+        """
+        Applies the pending inotify events
+        """
+        added = set()
+        removed = set()
+        for wd, mask, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                self.rescan()
+                return
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if wd not in self._watches:
+                # the git directory: only the index matters
+                if name == 'index' and self._git_dir is not None:
+                    self.rescan()
+                continue
+            if name == GITIGNORE_FILE:
+                # the ignored files change
+                self.rescan()
+                return
+            path = os.path.join(self._watches[wd], name)
+            if self._ignore.is_ignored(path, bool(mask & IN_ISDIR)):
+                continue
+            if mask & IN_ISDIR:
+                prefix = os.path.join(path, '')
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                    added.update(_walk_filepaths(
+                        self.root, self._ignore, path))
+                else:
+                    removed.update(
+                        file for file in self.files if file.startswith(prefix))
+                    for watched_wd, directory in list(self._watches.items()):
+                        if directory == path or directory.startswith(prefix):
+                            self.inotify.rm_watch(watched_wd)
+                            del self._watches[watched_wd]
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                added.add(path)
+                removed.discard(path)
+            else:
+                removed.add(path)
+                added.discard(path)
+        self._apply_changes(added - self.files, removed & self.files)
+
+    def refresh(self):
+        if self.inotify is not None:
+            self.process_events()
+        elif get_tree_fingerprint(self.root) != self._fingerprint:
+            self.rescan()
+
+    def existing_paths(self, paths):
+        """
+        Returns a dict mapping every path matching at least one file
+        to the first file it matched
+        """
+        self.refresh()
+        if self._added:
+            # files added since the previous request are the only new
+            # candidates for the paths that did not match anything
+            unmatched = PatternIndex(
+                path for path, file in self.results.items() if file is None)
+            self.results.update(unmatched.find_existing(self._added))
+            self._added = set()
+        unknown = [path for path in paths if path not in self.results]
+        if unknown:
+            if self._file_list is None:
+                self._file_list = sorted(self.files)
+            existing = find_existing(unknown, self._file_list)
+            self.results.update((path, existing.get(path)) for path in unknown)
+        return {
+            path: self.results[path] for path in paths
+            if self.results[path] is not None
+        }
+
+
+class LintDaemon:
+    def __init__(self, root='.', socket_path=None, idle_timeout=None):
+        """
+        root: top of the checkout to serve
+        socket_path: where to listen, see get_socket_path by default
+        idle_timeout: seconds without requests before exiting, None to run
+        until stopped
+        """
+        self.root = os.path.abspath(root)
+        self.real_root = os.path.realpath(root)
+        self.socket_path = socket_path or get_socket_path(self.root)
+        self.idle_timeout = idle_timeout
+        self.file_index = FileIndex(self.root, _open_inotify())
+        # CODEOWNERS file -> (mtime, size, parsed content)
+        self._codeowners = {}
+        self._running = False
+
+    def _get_codeowners_file(self, codeowners_file):
+        """
+        Returns the resolved path of codeowners_file, or None unless it is
+        one of the VALID_CODEOWNERS_PATHS of root: autofix rewrites it
+        """
+        if not isinstance(codeowners_file, str):
+            return None
+        codeowners_file = os.path.realpath(codeowners_file)
+        for valid_path in VALID_CODEOWNERS_PATHS:
+            if codeowners_file == os.path.join(self.real_root, valid_path):
+                return codeowners_file
+        return None
+
+    def _get_codeowners_data(self, codeowners_file):
+        stat = os.stat(codeowners_file)
+        cached = self._codeowners.get(codeowners_file)
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        codeowners_data = parse_codeowners(codeowners_file)
+        self._codeowners[codeowners_file] = (
+            stat.st_mtime_ns, stat.st_size, codeowners_data)
+        return codeowners_data
+
+    def lint(self, codeowners_file, no_autofix):
+        codeowners_data = self._get_codeowners_data(codeowners_file)
+        options = LintOptions(root=self.root, file_index=self.file_index)
+        violations = check(codeowners_data, options)
+        if not no_autofix:
+            # autofix rewrites the parsed content
+            del self._codeowners[codeowners_file]
+            violations.changed_line_ranges = fix(
+                codeowners_data, violations, codeowners_file)
+        return violations
+
+    def handle(self, request):
+        command = request.get('command')
+        if command == 'ping':
+            return {'root': self.root}
+        if command == 'shutdown':
+            self._running = False
+            return {}
+        if command != 'lint':
+            return {'error': f'unknown command {command!r}'}
+        root = request.get('root')
+        if not isinstance(root, str) or os.path.realpath(root) != self.real_root:
+            return {'error': f'this daemon serves {self.root}'}
+        codeowners_file = self._get_codeowners_file(
+            request.get('codeowners_file'))
+        if codeowners_file is None:
+            return {'error': f'not a CODEOWNERS file of {self.root}'}
+        try:
+            violations = self.lint(
+                codeowners_file, request.get('no_autofix', False))
+        except Exception as e:
+            logging.exception(
+                'Failed to lint %s', request.get('codeowners_file'))
+            return {'error': f'{type(e).__name__}: {e}'}
+        return {
+            'violations': violations.violation_error_messages,
+            'changed_line_ranges': violations.changed_line_ranges,
+        }
+
+    def _serve_connection(self, connection):
+        with connection:
+            connection.settimeout(DEFAULT_TIMEOUT)
+            try:
+                request = json.loads(read_message(connection))
+                response = self.handle(request)
+            except (OSError, ValueError) as e:
+                response = {'error': f'invalid request: {e}'}
+            try:
+                connection.sendall(json.dumps(response).encode() + b'\n')
+            except OSError:
+                pass
+
+    def serve_forever(self):
+        socket_dir = os.path.dirname(self.socket_path)
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        if not is_private_directory(socket_dir):
+            raise RuntimeError(
+                f'{socket_dir} must be a directory only accessible by its owner, the current user')
+        if os.path.exists(self.socket_path):
+            if send_request(self.socket_path, {'command': 'ping'}, 1) is not None:
+                raise RuntimeError(
+                    f'a daemon is already listening on {self.socket_path}')
+            os.unlink(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        selector = selectors.DefaultSelector()
+        try:
+            server.bind(self.socket_path)
+            server.listen()
+            selector.register(server, selectors.EVENT_READ)
+            if self.file_index.inotify is not None:
+                selector.register(self.file_index, selectors.EVENT_READ)
+            self._running = True
+            last_request = time.monotonic()
+            while self._running:
+                timeout = None
+                if self.idle_timeout is not None:
+                    timeout = self.idle_timeout - \
+                        (time.monotonic() - last_request)
+                    if timeout <= 0:
+                        break
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is server:
+                        connection, _ = server.accept()
+                        self._serve_connection(connection)
+                        last_request = time.monotonic()
+                    else:
+                        self.file_index.process_events()
+        finally:
+            selector.close()
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            if self.file_index.inotify is not None:
+                self.file_index.inotify.close()
+
+
+def _parse_arguments(args):
+    parser = argparse.ArgumentParser(
+        description='Keep the codeowners linter running for a checkout')
+    parser.add_argument('--root', default='.', required=False,
+                        help='root directory of the checkout')
+    parser.add_argument('--idle_timeout', type=float, default=0, required=False,
+                        help='seconds without requests before exiting, 0 to run until stopped')
+    parser.add_argument(
+        '--stop',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to stop the daemon running for the checkout',
+    )
+    return parser.parse_args(args)
+
+
+def main():
+    args = _parse_arguments(sys.argv[1:])
+    if args.stop:
+        if send_request(get_socket_path(args.root), {'command': 'shutdown'}, DEFAULT_TIMEOUT) is None:
+            logging.error('No daemon is running for %s',
+                          os.path.abspath(args.root))
+            sys.exit(1)
+        return
+    daemon = LintDaemon(args.root, idle_timeout=args.idle_timeout or None)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# The CLI side of the daemon: finds the socket of the daemon serving a
+# checkout and asks it to lint. Kept apart from the daemon so that the CLI
+# does not load the daemon's dependencies on every run.
+from __future__ import annotations
+
+import json
+import os
+import socket
+import stat
+
+from gitlab_codeowners_linter.cache import get_hash
+
+# seconds the CLI waits for an answer before linting in-process
+DEFAULT_TIMEOUT = 60
+_MAX_MESSAGE_SIZE = 16 * 1024 * 1024
+
+
+def get_socket_path(root='.'):
+    """
+    Returns the path of the socket of the daemon serving root
+    """
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        directory = os.path.join(runtime_dir, 'gitlab-codeowners-linter')
+    else:
+        import tempfile
+        directory = os.path.join(
+            tempfile.gettempdir(), f'gitlab-codeowners-linter-{os.getuid()}')
+    return os.path.join(directory, f'{get_hash(os.path.abspath(root))[:16]}.sock')
+
+
+def is_private_directory(directory):
+    """
+    The directory is a real directory (not a symlink) owned by the current
+    user, that no other user can read or write: the sockets in a shared
+    directory like /tmp could have been planted by anyone
+    """
+    try:
+        status = os.lstat(directory)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(status.st_mode) and status.st_uid == os.getuid()
+        and status.st_mode & 0o077 == 0
+    )
+
+
+def read_message(connection):
+    """
+    Reads one newline terminated message from connection
+    """
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > _MAX_MESSAGE_SIZE:
+            raise ValueError('message too large')
+    return data
+
+
+def send_request(socket_path, request, timeout):
+    """
+    Sends request to the daemon listening on socket_path, returns its
+    response or None if no daemon answered
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.settimeout(timeout)
+            connection.connect(socket_path)
+            connection.sendall(json.dumps(request).encode() + b'\n')
+            return json.loads(read_message(connection))
+    except (OSError, ValueError):
+        return None
+
+
+def request_lint(codeowners_file, no_autofix, root='.', timeout=DEFAULT_TIMEOUT):
+    """
+    Asks the daemon serving root to lint codeowners_file. Returns the
+    violation messages and the line ranges changed by autofix, or None
+    when no daemon is running for root.
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    socket_path = get_socket_path(root)
+    if not os.path.exists(socket_path) or not is_private_directory(os.path.dirname(socket_path)):
+        return None
+    response = send_request(socket_path, {
+        'command': 'lint',
+        'root': os.path.abspath(root),
+        'codeowners_file': os.path.abspath(codeowners_file),
+        'no_autofix': no_autofix,
+    }, timeout)
+    if response is None or 'error' in response:
+        return None
+    return response['violations'], [tuple(line_range) for line_range in response['changed_line_ranges']]
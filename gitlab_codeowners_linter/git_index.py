@@ -0,0 +1,245 @@
+from __future__ import annotations
+
+import os
+import struct
+
+# Layout of the git index file, see
+# https://git-scm.com/docs/index-format
+_SIGNATURE = b'DIRC'
+_HEADER = struct.Struct('>4sLL')
+# ctime, mtime, dev, ino, mode, uid, gid, size, object id, flags
+_ENTRY = struct.Struct('>8x8x4x4xL4x4x4x20xH')
+_EXTENDED_FLAG = 0x4000
+_STAGE_MASK = 0x3000
+_NAME_MASK = 0x0FFF
+_MODE_TYPE_MASK = 0o170000
+_MODE_GITLINK = 0o160000
+_MODE_DIRECTORY = 0o040000
+_SUPPORTED_VERSIONS = (2, 3, 4)
+# signature and size of the extensions following the entries
+_EXTENSION_HEADER = struct.Struct('>4sL')
+_LINK_EXTENSION = b'link'
+# bit count and word count of an EWAH bitmap
+_EWAH_HEADER = struct.Struct('>LL')
+# the index ends with a checksum of its whole content
+_INDEX_CHECKSUM_SIZE = 20
+
+
+class GitIndexError(Exception):
+    pass
+
+
+def find_git_dir(root='.'):
+    """
+    Returns the git directory of the work tree at root, or None if root
+    is not the top of a git work tree
+    """
+    dot_git = os.path.join(root, '.git')
+    if os.path.isdir(dot_git):
+        return dot_git
+    if os.path.isfile(dot_git):
+        # work trees and submodules have a .git file pointing to the git dir
+        with open(dot_git) as f:
+            content = f.read().strip()
+        if content.startswith('gitdir:'):
+            git_dir = content[len('gitdir:'):].strip()
+            return os.path.join(root, git_dir)
+    return None
+
+
+def get_index_path(root='.'):
+    git_dir = find_git_dir(root)
+    if git_dir is None:
+        return None
+    index_path = os.path.join(git_dir, 'index')
+    if not os.path.isfile(index_path):
+        return None
+    return index_path
+
+
+def _read_varint(data, offset):
+    # offset encoding used by the index v4 path prefix compression
+    byte = data[offset]
+    offset += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, offset
+
+
+def _read_ewah(data, offset):
+    """
+    Returns the positions of the bits set in the EWAH compressed bitmap at
+    offset, and the offset following it
+    """
+    _, word_count = _EWAH_HEADER.unpack_from(data, offset)
+    offset += _EWAH_HEADER.size
+    words = struct.unpack_from(f'>{word_count}Q', data, offset)
+    offset += 8 * word_count + 4
+    positions = set()
+    position = 0
+    index = 0
+    while index < word_count:
+        # a marker word: a run of identical words then literal words
+        marker = words[index]
+        run_length = (marker >> 1) & 0xFFFFFFFF
+        literal_count = marker >> 33
+        if marker & 1:
+            positions.update(range(position, position + run_length * 64))
+        position += run_length * 64
+        for word in words[index + 1:index + 1 + literal_count]:
+            while word:
+                lowest = word & -word
+                positions.add(position + lowest.bit_length() - 1)
+                word ^= lowest
+            position += 64
+        index += 1 + literal_count
+    return positions, offset
+
+
+def _parse_entries(data):
+    """
+    Returns the (name, stage, mode) of the entries of the content of a git
+    index file, in index order, and the offset of its extensions
+    """
+    if len(data) < _HEADER.size:
+        raise GitIndexError('truncated index header')
+    signature, version, count = _HEADER.unpack_from(data, 0)
+    if signature != _SIGNATURE:
+        raise GitIndexError('not a git index file')
+    if version not in _SUPPORTED_VERSIONS:
+        raise GitIndexError(f'unsupported index version {version}')
+
+    entries = []
+    previous_name = b''
+    offset = _HEADER.size
+    for _ in range(count):
+        entry_start = offset
+        mode, flags = _ENTRY.unpack_from(data, offset)
+        offset += _ENTRY.size
+        if version >= 3 and flags & _EXTENDED_FLAG:
+            offset += 2
+        if version == 4:
+            strip, offset = _read_varint(data, offset)
+            end = data.index(b'\0', offset)
+            name = previous_name[:len(previous_name) - strip] + \
+                data[offset:end]
+            offset = end + 1
+        else:
+            name_length = flags & _NAME_MASK
+            if name_length < _NAME_MASK:
+                end = offset + name_length
+            else:
+                end = data.index(b'\0', offset)
+            name = data[offset:end]
+            # entries are NUL padded to a multiple of 8 bytes
+            offset = entry_start + \
+                ((end - entry_start + 8) // 8) * 8
+        previous_name = name
+        entries.append((name, flags & _STAGE_MASK, mode))
+    return entries, offset
+
+
+def _find_link(data, offset):
+    """
+    Returns the content of the link extension of a split index, or None if
+    the index is not split
+    """
+    end = len(data) - _INDEX_CHECKSUM_SIZE
+    while offset + _EXTENSION_HEADER.size <= end:
+        signature, size = _EXTENSION_HEADER.unpack_from(data, offset)
+        offset += _EXTENSION_HEADER.size
+        if signature == _LINK_EXTENSION:
+            return data[offset:offset + size]
+        offset += size
+    return None
+
+
+def _merge_split_index(entries, link, git_dir):
+    """
+    Returns the entries of a split index merged with the ones of the shared
+    index it links to: entries holds the entries changed since the shared
+    index was written, the ones replacing a shared entry have no name
+    """
+    if git_dir is None:
+        raise GitIndexError('split index without its git directory')
+    shared_id = link[:_INDEX_CHECKSUM_SIZE].hex()
+    deleted = replaced = set()
+    if len(link) > _INDEX_CHECKSUM_SIZE:
+        deleted, offset = _read_ewah(link, _INDEX_CHECKSUM_SIZE)
+        replaced, _ = _read_ewah(link, offset)
+    with open(os.path.join(git_dir, f'sharedindex.{shared_id}'), 'rb') as f:
+        shared_entries, _ = _parse_entries(f.read())
+    if len(replaced) > len(entries):
+        raise GitIndexError('missing split index replacements')
+    replacements = iter(entries)
+    merged = {}
+    for position, (name, stage, mode) in enumerate(shared_entries):
+        if position in replaced:
+            _, _, mode = next(replacements)
+        if position not in deleted:
+            merged[name, stage] = mode
+    for name, stage, mode in entries[len(replaced):]:
+        if not name:
+            raise GitIndexError('split index entry without a name')
+        merged[name, stage] = mode
+    return [(name, stage, mode) for (name, stage), mode in sorted(merged.items())]
+
+
+def parse_index(data, gitlinks=None, git_dir=None):
+    """
+    Returns the paths of the files tracked in the content of a git index
+    file. Submodules (gitlinks) are not files and are left out.
+    gitlinks: list collecting the paths of the submodules
+    git_dir: git directory holding the shared index of a split index
+    """
+    entries, offset = _parse_entries(data)
+    link = _find_link(data, offset)
+    if link is not None:
+        # core.splitIndex: the index only holds the recent changes
+        entries = _merge_split_index(entries, link, git_dir)
+
+    paths = []
+    for name, _, mode in entries:
+        if not name:
+            raise GitIndexError('index entry without a name')
+        mode_type = mode & _MODE_TYPE_MASK
+        if mode_type == _MODE_DIRECTORY:
+            # sparse index: whole directories are collapsed in one entry
+            raise GitIndexError('sparse index is not supported')
+        if mode_type == _MODE_GITLINK:
+            if gitlinks is not None:
+                gitlinks.append(name.decode('utf-8', 'surrogateescape'))
+            continue
+        path = name.decode('utf-8', 'surrogateescape')
+        # unmerged paths have one entry per conflict stage
+        if paths and paths[-1] == path:
+            continue
+        paths.append(path)
+    return paths
+
+
+def read_tracked_files(root='.', nested=False):
+    """
+    Returns the files tracked in the git index of the work tree at root,
+    or None if they cannot be read from the index
+    nested: include the files of the checked out submodules, recursively
+    """
+    index_path = get_index_path(root)
+    if index_path is None:
+        return None
+    gitlinks = [] if nested else None
+    try:
+        with open(index_path, 'rb') as f:
+            paths = parse_index(
+                f.read(), gitlinks, os.path.dirname(index_path))
+    except (OSError, GitIndexError, IndexError, ValueError, struct.error):
+        return None
+    for gitlink in gitlinks or ():
+        submodule_paths = read_tracked_files(
+            os.path.join(root, gitlink), nested)
+        if submodule_paths is not None:
+            paths.extend(f'{gitlink}/{path}' for path in submodule_paths)
+    return paths
@@ -0,0 +1,110 @@
+# The .gitignore files and the exclude globs of a tree, applied while it is
+# walked so that ignored directories (build outputs, virtualenvs,
+# node_modules, ...) are pruned instead of enumerated and filtered afterwards.
+from __future__ import annotations
+
+import os
+
+GITIGNORE_FILE = '.gitignore'
+GIT_DIR = '.git'
+
+
+def _compile(lines):
+    """
+    Returns the patterns of lines deciding something, last first, or None
+    if there are none
+    """
+    # pathspec is only loaded for trees with ignore rules
+    from pathspec import PathSpec
+    spec = PathSpec.from_lines('gitwildmatch', lines)
+    # comments and blank lines compile to patterns deciding nothing
+    patterns = tuple(
+        pattern for pattern in reversed(spec.patterns) if pattern.include is not None)
+    return patterns or None
+
+
+def _check(patterns, path):
+    """
+    Returns whether the last of patterns matching path ignores it (a
+    negated pattern, !path, keeps it), None if none of them matches
+    """
+    # PathSpec.check_file does the same, only in recent pathspec versions
+    for pattern in patterns:
+        if pattern.regex.search(path) is not None:
+            return pattern.include
+    return None
+
+
+def _read_gitignore(directory):
+    try:
+        with open(os.path.join(directory, GITIGNORE_FILE)) as f:
+            return _compile(f.read().splitlines())
+    except OSError:
+        return None
+
+
+class IgnoreRules:
+    """
+    Decides whether the paths under root are ignored. A path is ignored if
+    it matches an exclude glob, or if the deepest .gitignore file with a
+    pattern matching it ignores it (a negated pattern, !path, keeps it).
+    The .gitignore files are read once, when their directory is visited.
+    """
+
+    def __init__(self, root='.', exclude=()):
+        """
+        root: top of the tree, the paths are relative to it
+        exclude: gitignore-style patterns relative to root, ignored on top
+        of the .gitignore files
+        """
+        self.root = root
+        self.exclude = _compile(exclude) if exclude else None
+        # directory -> ((directory, patterns) of the .gitignore files of the
+        # directory and its ancestors, outermost first)
+        self._specs = {}
+
+    def _get_specs(self, directory):
+        specs = self._specs.get(directory)
+        if specs is None:
+            parent = os.path.dirname(directory)
+            specs = () if directory == '' else self._get_specs(parent)
+            spec = _read_gitignore(os.path.join(self.root, directory))
+            if spec is not None:
+                specs = specs + ((directory, spec),)
+            self._specs[directory] = specs
+        return specs
+
+    def is_excluded(self, path):
+        """
+        The file path matches an exclude glob
+        """
+        return self.exclude is not None and bool(_check(self.exclude, path))
+
+    def is_ignored(self, path, is_dir=False):
+        """
+        path: file or directory relative to root
+        """
+        # directory-only patterns (build/) only match with the trailing slash
+        name = path + '/' if is_dir else path
+        if self.exclude is not None and _check(self.exclude, name):
+            return True
+        for directory, patterns in reversed(self._get_specs(os.path.dirname(path))):
+            include = _check(
+                patterns, name[len(directory) + 1:] if directory else name)
+            if include is not None:
+                return include
+        return False
+
+    def prune(self, directory, dirs, files):
+        """
+        Removes the ignored subdirectories of directory from dirs, in place
+        so that os.walk does not descend into them, and returns the files
+        of directory that are not ignored
+        """
+        prefix = os.path.join(directory, '') if directory else ''
+        # the git directory is never part of the files, even when the git
+        # index cannot be read and the work tree is walked instead
+        dirs[:] = [
+            name for name in dirs
+            if name != GIT_DIR and not self.is_ignored(prefix + name, True)]
+        return [name for name in files if not self.is_ignored(prefix + name)]
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import argparse
+import os
+import sys
 from pathlib import Path
 
 from gitlab_codeowners_linter.constants import VALID_CODEOWNERS_PATHS
+from gitlab_codeowners_linter.coverage import DEFAULT_COVERAGE_DEPTH
+from gitlab_codeowners_linter.options import LintOptions
+from gitlab_codeowners_linter.report import OUTPUT_FORMATS
+from gitlab_codeowners_linter.rules import select_rules
 
 
 def _parse_arguments(args):
@@ -17,6 +23,65 @@ def _parse_arguments(args):
         action='store_true',
         help='Set to disable autofix',
     )
+    parser.add_argument('--cache_dir', type=Path, required=False,
+                        help='directory where the path existence results are cached between runs')
+    parser.add_argument(
+        '--incremental',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to only re-check the paths affected by the files passed as positional arguments',
+    )
+    parser.add_argument('--jobs', type=int, default=1, required=False,
+                        help='number of processes checking that paths exist, 0 to use all the CPUs')
+    parser.add_argument('--profile', nargs='?', const='-', required=False,
+                        help='print the time, items processed and peak memory of every phase, or write them as JSON to the given file')
+    parser.add_argument(
+        '--daemon',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to ask the daemon running for the checkout, if any, to lint',
+    )
+    parser.add_argument(
+        '--no_daemon',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to always lint in-process, the default, even with --daemon',
+    )
+    parser.add_argument(
+        '--check_shadowed',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to report the entries overridden, for every file they match, by a later entry of their section',
+    )
+    parser.add_argument(
+        '--all_codeowners',
+        default=False,
+        required=False,
+        action='store_true',
+        help='Set to lint every CODEOWNERS file of the tree and of its submodules, each against its own directory',
+    )
+    parser.add_argument('--min_coverage', type=float, required=False,
+                        help='minimum percentage of the files that must be matched by a path')
+    parser.add_argument('--coverage_report', required=False,
+                        help='write the files matched by no path and the coverage per directory as JSON lines to this file, - for stdout')
+    parser.add_argument('--coverage_depth', type=int, default=DEFAULT_COVERAGE_DEPTH, required=False,
+                        help='depth of the deepest directories in the coverage report')
+    parser.add_argument('--exclude', action='append', default=[], required=False,
+                        help='gitignore-style pattern of files to leave out, ignored directories are not walked (repeatable)')
+    parser.add_argument('--owners_snapshot', required=False,
+                        help='JSON or CSV export of the GitLab users and groups, report the owners not in it')
+    parser.add_argument('--select', action='append', required=False,
+                        help='comma separated rules or tiers (formatting, files) to check, all for every rule including the plugin ones (repeatable)')
+    parser.add_argument('--ignore', action='append', default=[], required=False,
+                        help='comma separated rules or tiers not to check (repeatable)')
+    parser.add_argument('--output_format', choices=OUTPUT_FORMATS, default='text', required=False,
+                        help='report the violations as log messages, or with their line numbers as JSON, SARIF or a GitLab Code Quality report')
+    parser.add_argument('--output', required=False,
+                        help='write the JSON, SARIF or Code Quality report to this file instead of stdout')
     return parser.parse_known_args(args)
 
 
@@ -27,8 +92,15 @@ def _get_codeowners_path(positional_args):
     return None
 
 
-def get_arguments(args):
-    args, positional_args = _parse_arguments(args)
+def find_codeowners_file(root):
+    for codeowners_path in VALID_CODEOWNERS_PATHS:
+        codeowners_file = os.path.join(root, codeowners_path)
+        if os.path.isfile(codeowners_file):
+            return codeowners_file
+    return None
+
+
+def _get_codeowners_file(args, positional_args):
     codeowners_file = None
     if str(args.codeowners_file) in VALID_CODEOWNERS_PATHS:
         codeowners_file = args.codeowners_file
@@ -36,4 +108,49 @@ def get_arguments(args):
         codeowners_file = _get_codeowners_path(positional_args)
     else:
         pass
-    return codeowners_file, args.no_autofix
+    return codeowners_file
+
+
+def _split_names(values):
+    return [name.strip() for value in values for name in value.split(',') if name.strip()]
+
+
+def get_options(args):
+    args, positional_args = _parse_arguments(args)
+    codeowners_file = _get_codeowners_file(args, positional_args)
+    # pre-commit passes the staged files as positional arguments
+    changed_files = [
+        os.path.normpath(arg) for arg in positional_args
+        if not arg.startswith('-') and arg != str(codeowners_file)
+    ]
+    options = LintOptions(
+        cache_dir=args.cache_dir,
+        incremental=args.incremental,
+        changed_files=changed_files,
+        jobs=args.jobs if args.jobs > 0 else os.cpu_count(),
+        profile=args.profile,
+        daemon=args.daemon and not args.no_daemon,
+        check_shadowed=args.check_shadowed,
+        min_coverage=args.min_coverage,
+        coverage_report=args.coverage_report,
+        coverage_depth=args.coverage_depth,
+        all_codeowners=args.all_codeowners,
+        output_format=args.output_format,
+        output=args.output,
+        exclude=args.exclude,
+        select=_split_names(args.select) if args.select is not None else None,
+        ignore=_split_names(args.ignore),
+        owners_snapshot=args.owners_snapshot,
+    )
+    try:
+        rules = select_rules(options.select, options.ignore)
+    except ValueError as e:
+        sys.exit(f'error: {e}')
+    if 'unknown-owner' in rules and options.owners_snapshot is None:
+        sys.exit('error: the unknown-owner rule needs --owners_snapshot')
+    return codeowners_file, args.no_autofix, options
+
+
+def get_arguments(args):
+    codeowners_file, no_autofix, _ = get_options(args)
+    return codeowners_file, no_autofix
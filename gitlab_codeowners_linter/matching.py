@@ -0,0 +1,511 @@
+from __future__ import annotations
+
+import functools
+import re
+from collections import OrderedDict
+
+from gitlab_codeowners_linter import profiling
+
+# Patterns without any wildcard, escape or negation can be resolved without
+# running a regex: they are either a literal path or a bare file/dir name
+_GLOB_CHARS = re.compile(r'[*?\[\]\\!]')
+# '*.ext' and 'dir/**/*.ext' patterns are resolved with a lookup of the
+# file/dir name suffixes
+_EXTENSION_PATTERN = re.compile(r'\*(\.[^/*?\[\]\\!]+)')
+_EXTENSION_PREFIX = '^(?:.+/)?[^/]*'
+_EXTENSION_UNDER_PREFIX = '(?:/.+)?/[^/]*'
+# What follows the literal directory of an anchored glob, e.g. /src/**/*.py
+_PREFIX_SEPARATORS = ('/', '(?:/.+)?/')
+_NAMED_GROUP = re.compile(r'\(\?P<\w+>')
+
+# The gitwildmatch translations a plain pattern is expected to produce.
+# pathspec changed the spelling of the suffixes over time, all are accepted
+_ANCHORED_PREFIXES = ('^',)
+_UNANCHORED_PREFIXES = ('^(?:.+/)?',)
+_FILE_OR_DIR_SUFFIXES = (
+    '(?:(?P<ps_d>/)|$)', '(?:(?P<ps_d>/).*)?$', '(?:/.*)?$')
+_DIR_ONLY_SUFFIXES = ('(?P<ps_d>/)', '(?P<ps_d>/).*$', '/.*$')
+
+# Number of glob regexes combined into a single prefilter regex
+_GLOB_GROUP_SIZE = 32
+# Prefilter hits without any match tolerated before the prefilter of a
+# group is rebuilt without its already matched members
+_STALE_HITS_BEFORE_REBUILD = 64
+# Number of distinct patterns whose compilation is kept in memory
+PATTERN_CACHE_SIZE = 65536
+# Number of pattern chunks handed to each worker process
+_CHUNKS_PER_JOB = 4
+
+# File list of the worker processes, set once per worker
+_worker_files = None
+
+LITERAL = 'literal'
+NAME = 'name'
+EXTENSION = 'extension'
+GLOB = 'glob'
+NULL = 'null'
+
+
+class CompiledPattern:
+    def __init__(self, pattern, kind, body=None, dir_only=False, regex=None, prefix=None):
+        """
+        pattern: the CODEOWNERS path as written in the file
+        kind: one of LITERAL, NAME, EXTENSION, GLOB or NULL (a pattern
+        matching nothing)
+        body: the path (LITERAL), the file/dir name (NAME) or the name
+        suffix (EXTENSION) to look up
+        dir_only: the pattern only matches the content of a directory
+        regex: the gitwildmatch regex source, set for GLOB patterns
+        prefix: literal directory containing every file an EXTENSION or
+        GLOB pattern matches, if any
+        """
+        self.pattern = pattern
+        self.kind = kind
+        self.body = body
+        self.dir_only = dir_only
+        self.regex = regex
+        self.prefix = prefix
+        self._compiled_regex = None
+
+    @property
+    def compiled_regex(self):
+        if self._compiled_regex is None:
+            self._compiled_regex = re.compile(self.regex)
+        return self._compiled_regex
+
+
+class TranslationCache:
+    """
+    LRU bounded cache of the gitwildmatch to regex translation of patterns,
+    which can be saved to disk so that cold starts skip the translation
+    """
+
+    def __init__(self, maxsize=PATTERN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.translations = OrderedDict()
+        # True when translations were added since the last load or save
+        self.modified = False
+
+    def get(self, pattern):
+        if pattern in self.translations:
+            self.translations.move_to_end(pattern)
+            return self.translations[pattern]
+        # pathspec is only loaded when a pattern is not in the cache
+        from pathspec.patterns import GitWildMatchPattern
+        regex, _ = GitWildMatchPattern.pattern_to_regex(pattern)
+        self.translations[pattern] = regex
+        self.modified = True
+        if len(self.translations) > self.maxsize:
+            self.translations.popitem(last=False)
+        return regex
+
+    def update(self, translations):
+        for pattern, regex in translations.items():
+            if pattern not in self.translations:
+                self.translations[pattern] = regex
+        while len(self.translations) > self.maxsize:
+            self.translations.popitem(last=False)
+
+
+# Shared by every index of the process, e.g. across the files of a batch
+translation_cache = TranslationCache()
+
+
+@functools.lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern):
+    """
+    Classifies pattern, see CompiledPattern. Identical patterns, e.g. the
+    same path in several sections, are only compiled once.
+    """
+    regex = translation_cache.get(pattern)
+    if regex is None:
+        return CompiledPattern(pattern, NULL)
+    if _GLOB_CHARS.search(pattern):
+        return _compile_glob(pattern, regex)
+    dir_only = pattern.endswith('/')
+    body = pattern.strip('/')
+    anchored = pattern.startswith('/') or '/' in body
+    prefixes = _ANCHORED_PREFIXES if anchored else _UNANCHORED_PREFIXES
+    suffixes = _DIR_ONLY_SUFFIXES if dir_only else _FILE_OR_DIR_SUFFIXES
+    expected = {
+        prefix + re.escape(body) + suffix
+        for prefix in prefixes
+        for suffix in suffixes
+    }
+    if regex not in expected:
+        # anything unusual (e.g. empty path components) keeps the exact
+        # pathspec semantics by going through the regex
+        return CompiledPattern(pattern, GLOB, regex=regex)
+    return CompiledPattern(pattern, LITERAL if anchored else NAME, body, dir_only)
+
+
+def _compile_glob(pattern, regex):
+    extension = _EXTENSION_PATTERN.fullmatch(pattern)
+    if extension is not None:
+        body = extension.group(1)
+        expected = {
+            _EXTENSION_PREFIX + re.escape(body) + suffix
+            for suffix in _FILE_OR_DIR_SUFFIXES
+        }
+        if regex in expected:
+            return CompiledPattern(pattern, EXTENSION, body)
+    # the literal directories the glob starts with, when it is anchored
+    components = pattern.lstrip('/').split('/')
+    literal_components = []
+    for component in components[:-1]:
+        if not component or component in ('.', '..') or _GLOB_CHARS.search(component):
+            break
+        literal_components.append(component)
+    prefix = '/'.join(literal_components)
+    if not prefix or not regex.startswith('^' + re.escape(prefix)):
+        return CompiledPattern(pattern, GLOB, regex=regex)
+    rest = regex[len('^' + re.escape(prefix)):]
+    extension = _EXTENSION_PATTERN.fullmatch(components[-1])
+    if extension is not None and components[len(literal_components):-1] == ['**']:
+        body = extension.group(1)
+        expected = {
+            _EXTENSION_UNDER_PREFIX + re.escape(body) + suffix
+            for suffix in _FILE_OR_DIR_SUFFIXES
+        }
+        if rest in expected:
+            return CompiledPattern(pattern, EXTENSION, body, prefix=prefix)
+    if rest.startswith(_PREFIX_SEPARATORS):
+        return CompiledPattern(pattern, GLOB, regex=regex, prefix=prefix)
+    return CompiledPattern(pattern, GLOB, regex=regex)
+
+
+class _GlobGroup:
+    def __init__(self, members, prefilter=None, counting=False):
+        """
+        members: list of (pattern id, compiled regex) tested together
+        prefilter: the combined regex of members, built if None
+        counting: whether to count evaluations, only done when profiling
+        """
+        self.members = members
+        self.prefilter = prefilter
+        # prefilter hits that no remaining member matched, since the
+        # prefilter still includes members discarded after it was built
+        self._stale_hits = 0
+        self.counting = counting
+        # number of member regexes run after a prefilter hit
+        self.evaluations = 0
+        if prefilter is None:
+            self._build()
+
+    def _build(self):
+        sources = (
+            '(?:' + _NAMED_GROUP.sub('(?:', regex.pattern) + ')'
+            for _, regex in self.members
+        )
+        self.prefilter = re.compile('|'.join(sources))
+        self._stale_hits = 0
+
+    def match(self, path):
+        if not self.prefilter.match(path):
+            return []
+        if self.counting:
+            self.evaluations += len(self.members)
+        pids = [pid for pid, regex in self.members if regex.match(path)]
+        if not pids:
+            self._stale_hits += 1
+            # compiling is costly, only rebuild once stale hits add up
+            if self._stale_hits > _STALE_HITS_BEFORE_REBUILD:
+                self._build()
+        return pids
+
+    def discard(self, pids):
+        self.members = [
+            (pid, regex) for pid, regex in self.members if pid not in pids
+        ]
+
+
+class MatchMatrix:
+    """
+    Sparse file x pattern match matrix where the files matching the same
+    patterns share a row
+    """
+
+    def __init__(self, patterns):
+        """
+        patterns: the patterns of the PatternIndex the matrix comes from
+        """
+        self.patterns = patterns
+        # tuple of matching pattern ids -> [first file, number of files]
+        self.rows = {}
+
+    def add(self, pids, path):
+        row = self.rows.get(pids)
+        if row is None:
+            self.rows[pids] = [path, 1]
+        else:
+            row[1] += 1
+
+    def iter_rows(self):
+        """
+        Yields (matching patterns, first file, number of files) for every row
+        """
+        for pids, (path, count) in self.rows.items():
+            yield tuple(self.patterns[pid] for pid in pids), path, count
+
+    def existing(self):
+        """
+        Returns a dict with every pattern matching at least one file mapped
+        to the first file it matched
+        """
+        existing = {}
+        # rows are in the order of their first file
+        for pids, (path, _) in self.rows.items():
+            for pid in pids:
+                existing.setdefault(self.patterns[pid], path)
+        return existing
+
+
+def _match_extensions(extensions, components, pids):
+    """
+    Adds to pids the ids of the extensions any of components ends with
+    """
+    for component in components:
+        dot = component.find('.')
+        while dot != -1:
+            pids.extend(extensions.get(component[dot:], ()))
+            dot = component.find('.', dot + 1)
+
+
+class PatternIndex:
+    """
+    Classifies file paths against many gitwildmatch patterns at once.
+
+    Literal paths are resolved with a hash lookup, literal directories with
+    a walk down a trie of path components, bare names and '*.ext' patterns
+    with hash lookups per path component, and only real globs are matched
+    with regexes: the ones under a literal directory when the walk reaches
+    it, the others through combined prefilter regexes.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = []
+        self._ids = {}
+        self._files = {}
+        self._trie = {}
+        self._names = {}
+        self._dir_names = {}
+        self._extensions = {}
+        # regexes of globs under a literal directory run by the last call
+        self._prefix_evaluations = 0
+        # evaluations are only counted when profiling
+        self._counting = False
+        self._null_count = 0
+        # statistics of the last find_existing call
+        self.files_scanned = 0
+        self.regex_evaluations = 0
+        globs = []
+        for pattern in patterns:
+            if pattern in self._ids:
+                continue
+            pid = len(self.patterns)
+            self._ids[pattern] = pid
+            self.patterns.append(pattern)
+            compiled = compile_pattern(pattern)
+            if compiled.kind == LITERAL:
+                if not compiled.dir_only:
+                    self._files.setdefault(compiled.body, []).append(pid)
+                self._get_trie_node(compiled.body)[1].append(pid)
+            elif compiled.kind == NAME:
+                names = self._dir_names if compiled.dir_only else self._names
+                names.setdefault(compiled.body, []).append(pid)
+            elif compiled.kind == EXTENSION and compiled.prefix is not None:
+                self._get_trie_node(compiled.prefix)[3].setdefault(
+                    compiled.body, []).append(pid)
+            elif compiled.kind == EXTENSION:
+                self._extensions.setdefault(compiled.body, []).append(pid)
+            elif compiled.kind == GLOB and compiled.prefix is not None:
+                self._get_trie_node(compiled.prefix)[2].append(
+                    (pid, compiled.compiled_regex))
+            elif compiled.kind == GLOB:
+                globs.append((pid, compiled.compiled_regex))
+            else:
+                self._null_count += 1
+        self._glob_groups = [
+            _GlobGroup(globs[i:i + _GLOB_GROUP_SIZE])
+            for i in range(0, len(globs), _GLOB_GROUP_SIZE)
+        ]
+
+    def _get_trie_node(self, directory):
+        """
+        Returns the (children, literal pattern ids, globs, extensions) node
+        of directory
+        """
+        children = self._trie
+        for component in directory.split('/'):
+            node = children.setdefault(component, ({}, [], [], {}))
+            children = node[0]
+        return node
+
+    def _match_ids(self, path, glob_groups, matched=()):
+        """
+        matched: ids of patterns already matched, their regexes are skipped
+        """
+        counting = self._counting
+        pids = []
+        pids.extend(self._files.get(path, ()))
+        components = path.split('/')
+        # literal directories: every parent directory of the file
+        children = self._trie
+        for depth, component in enumerate(components[:-1]):
+            node = children.get(component)
+            if node is None:
+                break
+            children, dir_pids, globs, extensions = node
+            pids.extend(dir_pids)
+            if extensions:
+                _match_extensions(extensions, components[depth + 1:], pids)
+            for pid, regex in globs:
+                if pid not in matched:
+                    if counting:
+                        self._prefix_evaluations += 1
+                    if regex.match(path):
+                        pids.append(pid)
+        if self._names or self._dir_names:
+            for component in components[:-1]:
+                pids.extend(self._names.get(component, ()))
+                pids.extend(self._dir_names.get(component, ()))
+            pids.extend(self._names.get(components[-1], ()))
+        if self._extensions:
+            _match_extensions(self._extensions, components, pids)
+        for group in glob_groups:
+            pids.extend(group.match(path))
+        return pids
+
+    def match(self, path):
+        """
+        Returns the patterns matching path, in the order they were given
+        """
+        pids = sorted(set(self._match_ids(path, self._glob_groups)))
+        return [self.patterns[pid] for pid in pids]
+
+    def matches_any(self, path):
+        """
+        Returns True if at least one of the patterns matches path
+        """
+        return bool(self._match_ids(path, self._glob_groups))
+
+    def match_matrix(self, files):
+        """
+        Matches every file against all the patterns, returns the MatchMatrix
+        """
+        matrix = MatchMatrix(self.patterns)
+        counting = self._counting = profiling.is_enabled()
+        self._prefix_evaluations = 0
+        for group in self._glob_groups:
+            group.counting = counting
+        group_evaluations = sum(
+            group.evaluations for group in self._glob_groups)
+        files_scanned = 0
+        for path in files:
+            files_scanned += 1
+            matrix.add(
+                tuple(sorted(set(self._match_ids(path, self._glob_groups)))), path)
+        self.files_scanned = files_scanned
+        self.regex_evaluations = 0
+        if counting:
+            self.regex_evaluations = files_scanned * len(self._glob_groups) + \
+                self._prefix_evaluations + \
+                sum(group.evaluations for group in self._glob_groups) - \
+                group_evaluations
+        self._counting = False
+        for group in self._glob_groups:
+            group.counting = False
+        return matrix
+
+    def find_existing(self, files):
+        """
+        Returns a dict with every pattern matching at least one of the files
+        mapped to the first file it matched. Stops reading files as soon as
+        every pattern has been matched.
+        """
+        existing = {}
+        remaining = len(self.patterns) - self._null_count
+        counting = self._counting = profiling.is_enabled()
+        glob_groups = [_GlobGroup(group.members, group.prefilter, counting)
+                       for group in self._glob_groups]
+        all_glob_groups = list(glob_groups)
+        files_scanned = 0
+        prefilter_evaluations = 0
+        self._prefix_evaluations = 0
+        matched = set()
+        for path in files:
+            if remaining == 0:
+                break
+            files_scanned += 1
+            if counting:
+                prefilter_evaluations += len(glob_groups)
+            new_pids = set()
+            for pid in self._match_ids(path, glob_groups, matched):
+                if self.patterns[pid] not in existing:
+                    existing[self.patterns[pid]] = path
+                    new_pids.add(pid)
+            if not new_pids:
+                continue
+            matched |= new_pids
+            remaining -= len(new_pids)
+            # matched globs no longer need to be tested
+            for group in glob_groups:
+                if any(pid in new_pids for pid, _ in group.members):
+                    group.discard(new_pids)
+            glob_groups = [group for group in glob_groups if group.members]
+        self.files_scanned = files_scanned
+        self.regex_evaluations = prefilter_evaluations + \
+            self._prefix_evaluations + \
+            sum(group.evaluations for group in all_glob_groups)
+        self._counting = False
+        return existing
+
+
+def _init_worker(files):
+    global _worker_files
+    _worker_files = files
+
+
+def _find_existing_in_worker(patterns):
+    return PatternIndex(patterns).find_existing(_worker_files)
+
+
+def find_existing(patterns, files, jobs=1):
+    """
+    Returns a dict with every pattern matching at least one of the files
+    mapped to the first file it matched, splitting the patterns across
+    jobs worker processes
+    """
+    patterns = list(dict.fromkeys(patterns))
+    if jobs <= 1 or len(patterns) < 2:
+        index = PatternIndex(patterns)
+        existing = index.find_existing(files)
+        profiling.count('pattern_matching', 'files_scanned',
+                        index.files_scanned)
+        profiling.count('pattern_matching', 'regex_evaluations',
+                        index.regex_evaluations)
+        return existing
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    chunk_count = min(len(patterns), jobs * _CHUNKS_PER_JOB)
+    chunks = [patterns[i::chunk_count] for i in range(chunk_count)]
+    # the file list is handed to each worker once, when it starts (and is
+    # not copied at all where workers are forked), not to every task
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+    existing = {}
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(list(files),),
+    ) as executor:
+        for chunk_existing in executor.map(_find_existing_in_worker, chunks):
+            existing.update(chunk_existing)
+    # same order as a serial run
+    return {
+        pattern: existing[pattern]
+        for pattern in patterns if pattern in existing
+    }
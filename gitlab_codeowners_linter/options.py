@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from gitlab_codeowners_linter.cache import get_default_cache_dir
+from gitlab_codeowners_linter.coverage import DEFAULT_COVERAGE_DEPTH
+
+
+class LintOptions:
+    def __init__(self, cache_dir=None, incremental=False, changed_files=(), jobs=1, profile=None, root='.', file_index=None, daemon=False, check_shadowed=False,
+                 min_coverage=None, coverage_report=None, coverage_depth=DEFAULT_COVERAGE_DEPTH, coverage_prefix='',
+                 all_codeowners=False, files=None, tree_fingerprint=None, output_format='text', output=None, exclude=(),
+                 select=None, ignore=(), owners_snapshot=None):
+        """
+        cache_dir: directory where the path existence results are cached
+        between runs, no caching if None
+        incremental: reuse the results of the previous run, stored in
+        cache_dir (cache.get_default_cache_dir() if None), for the paths
+        that cannot have changed
+        changed_files: files added or modified since the previous run
+        jobs: number of processes matching the paths against the files
+        profile: where to report the time spent in every phase, '-' for a
+        table on stderr or the path of a JSON file, no profiling if None
+        root: top of the file tree the CODEOWNERS paths are relative to
+        file_index: daemon.FileIndex kept up to date by a daemon, answering
+        the existence of paths instead of enumerating the files
+        daemon: ask the daemon running for root, if any, to lint, see
+        codeowners_linter._use_daemon
+        check_shadowed: report the entries that apply to no file because a
+        later entry of their section matches all their files
+        min_coverage: minimum percentage of the files matched by a path,
+        not checked if None
+        coverage_report: where to write the uncovered files and the coverage
+        per directory as JSON lines, '-' for stdout, a file path or an open
+        stream, no report if None
+        coverage_depth: depth of the deepest directories in the report
+        coverage_prefix: prepended to the paths of the report, the directory
+        of the CODEOWNERS file relative to the top of an all_codeowners run
+        all_codeowners: lint every CODEOWNERS file found under root, each
+        against the files of its own directory
+        files: the files under root, enumerated if None
+        tree_fingerprint: digest identifying files, computed from the tree
+        if None
+        output_format: how the violations are reported, one of
+        report.OUTPUT_FORMATS
+        output: where the violations are written when output_format is not
+        'text', stdout if None
+        exclude: gitignore-style patterns of the files left out of the
+        checks, on top of the ignored files
+        select: ids or tiers of the rules to check, see rules.select_rules,
+        the default rules if None
+        ignore: ids or tiers of the rules not to check
+        owners_snapshot: JSON or CSV export of the users and groups the
+        owners must be among, see owners.read_snapshot, not checked if None
+        """
+        if incremental and cache_dir is None:
+            cache_dir = get_default_cache_dir()
+        self.cache_dir = cache_dir
+        self.incremental = incremental
+        self.changed_files = changed_files
+        self.jobs = jobs
+        self.profile = profile
+        self.root = root
+        self.file_index = file_index
+        self.daemon = daemon
+        self.check_shadowed = check_shadowed
+        self.min_coverage = min_coverage
+        self.coverage_report = coverage_report
+        self.coverage_depth = coverage_depth
+        self.coverage_prefix = coverage_prefix
+        self.all_codeowners = all_codeowners
+        self.files = files
+        self.tree_fingerprint = tree_fingerprint
+        self.output_format = output_format
+        self.output = output
+        self.exclude = exclude
+        self.select = select
+        self.ignore = ignore
+        self.owners_snapshot = owners_snapshot
@@ -0,0 +1,138 @@
+# The users and groups of a GitLab instance, loaded from a snapshot file
+# (a JSON or CSV export) to check the owners of the CODEOWNERS entries. The
+# known owners are kept as a frozenset of normalized names, and the close
+# matches of an unknown owner are only searched among names of a similar
+# length sharing its first or last character.
+from __future__ import annotations
+
+import csv
+import difflib
+import json
+import os
+
+from gitlab_codeowners_linter import profiling
+from gitlab_codeowners_linter.cache import load_owner_index
+from gitlab_codeowners_linter.cache import store_owner_index
+
+# roles GitLab accepts as owners, e.g. @@maintainer
+ROLES = frozenset(('@@developer', '@@maintainer', '@@owner'))
+# fields of the exported users and groups holding an owner name
+_NAME_FIELDS = ('username', 'full_path', 'path', 'group')
+_EMAIL_FIELDS = ('email', 'public_email', 'commit_email')
+# how close a known owner must be to an unknown one to be suggested
+_SUGGESTION_CUTOFF = 0.8
+_SUGGESTION_LENGTH_DIFFERENCE = 2
+
+
+def normalize_owner(owner):
+    """
+    Returns owner as stored in an OwnerDirectory: usernames, group paths
+    and emails are case insensitive
+    """
+    return owner.lower()
+
+
+def _get_record_owners(record):
+    if isinstance(record, str):
+        record = record.strip()
+        if not record:
+            return
+        if '@' in record:
+            yield record
+        else:
+            yield '@' + record
+        return
+    for field in _NAME_FIELDS:
+        value = record.get(field)
+        if value:
+            yield '@' + value.lstrip('@')
+    for field in _EMAIL_FIELDS:
+        value = record.get(field)
+        if value:
+            yield value
+
+
+def _iter_json_records(content):
+    if isinstance(content, dict):
+        # {"users": [...], "groups": [...]}
+        for records in content.values():
+            yield from records
+    else:
+        yield from content
+
+
+def read_snapshot(snapshot_path):
+    """
+    Yields the owners listed in the snapshot file: a JSON list of users
+    and groups as returned by the GitLab API (or an object of such lists),
+    or a CSV file with a header naming the username, full_path and email
+    columns. Plain names are accepted in place of the records.
+    """
+    with open(snapshot_path, newline='') as f:
+        if snapshot_path.endswith('.csv'):
+            for record in csv.DictReader(f):
+                yield from _get_record_owners(
+                    {field.strip().lower(): value.strip() for field, value in record.items() if field and value})
+        else:
+            for record in _iter_json_records(json.load(f)):
+                yield from _get_record_owners(record)
+
+
+class OwnerDirectory:
+    def __init__(self, owners):
+        """
+        owners: the known usernames and group paths (with their @) and
+        emails, normalized with normalize_owner
+        """
+        self.owners = frozenset(owners)
+        # (length, first or last character) -> known owners, built on the
+        # first suggestion
+        self._buckets = None
+
+    def __len__(self):
+        return len(self.owners)
+
+    def is_known(self, owner):
+        owner = normalize_owner(owner)
+        return owner in self.owners or owner in ROLES
+
+    def suggest(self, owner):
+        """
+        Returns the known owner closest to owner, or None if none is close
+        """
+        if self._buckets is None:
+            self._buckets = {}
+            for known in sorted(self.owners):
+                # a typo rarely changes both ends of a name ('@' aside)
+                for key in {(len(known), known[1:2]), (len(known), known[-1])}:
+                    self._buckets.setdefault(key, []).append(known)
+        owner = normalize_owner(owner)
+        candidates = {
+            known
+            for length in range(len(owner) - _SUGGESTION_LENGTH_DIFFERENCE,
+                                len(owner) + _SUGGESTION_LENGTH_DIFFERENCE + 1)
+            for character in {owner[1:2], owner[-1:]}
+            for known in self._buckets.get((length, character), ())
+        }
+        matches = difflib.get_close_matches(
+            owner, sorted(candidates), n=1, cutoff=_SUGGESTION_CUTOFF)
+        return matches[0] if matches else None
+
+
+def load_owner_directory(snapshot_path, cache_dir=None):
+    """
+    Returns the OwnerDirectory of the snapshot file. With a cache_dir, the
+    owners are read from a binary index saved there after the first load,
+    until the snapshot changes.
+    """
+    with profiling.phase('owner_directory') as phase:
+        owners = None
+        if cache_dir is not None:
+            owners = load_owner_index(cache_dir, snapshot_path)
+        if owners is None:
+            owners = sorted({
+                normalize_owner(owner) for owner in read_snapshot(os.fspath(snapshot_path))})
+            if cache_dir is not None:
+                store_owner_index(cache_dir, snapshot_path, owners)
+        phase.count('owners', len(owners))
+    return OwnerDirectory(owners)
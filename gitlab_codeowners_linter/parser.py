@@ -1,71 +1,148 @@
 from __future__ import annotations
 
+import mmap
 import re
+import sys
+from collections.abc import Sequence
 from pathlib import Path
 
+from gitlab_codeowners_linter import profiling
 from gitlab_codeowners_linter.constants import DEFAULT_SECTION
 
 
+# Entries without comments, the vast majority, all share this comment block
+# until their comments are used
+EMPTY_COMMENTS = ()
+
+
+class PathsView(Sequence):
+    """
+    Read-only view of the paths of a section, always in sync with its entries
+    """
+    __slots__ = ('_section',)
+
+    def __init__(self, section):
+        self._section = section
+
+    def __len__(self):
+        return len(self._section.entries)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [entry.path for entry in self._section.entries[index]]
+        return self._section.entries[index].path
+
+    def __iter__(self):
+        return (entry.path for entry in self._section.entries)
+
+
 class CodeownerSection:
-    def __init__(self, section_name, comment_block, entries):
+    __slots__ = ('codeowner_section', 'comments', 'entries', 'line')
+
+    def __init__(self, section_name, comment_block, entries, line=0):
+        """
+        line: line number of the section header in the file, 0 for the
+        default section or a section built in memory
+        """
         self.codeowner_section = section_name
         self.comments = comment_block
         self.entries = entries
+        self.line = line
 
     def get_paths(self):
         return [entries.path for entries in self.entries]
 
+    @property
+    def paths(self):
+        return PathsView(self)
+
 
 class CodeownerEntry:
-    def __init__(self, path, comment_block, owners=''):
+    __slots__ = ('path', '_comments', 'owners', 'line')
+
+    def __init__(self, path, comment_block, owners='', line=0):
+        """
+        comment_block: list of the comment lines above the entry, or a
+        tuple shared with other entries, copied the first time it is used
+        line: line number of the entry in the file, 0 for an entry built
+        in memory
+        """
         self.path = path
-        self.comments = comment_block
+        self._comments = comment_block
         self.owners = owners
+        self.line = line
 
+    @property
+    def comments(self):
+        comments = self._comments
+        if type(comments) is tuple:
+            # the block is shared, the entry gets its own list to modify
+            comments = self._comments = list(comments)
+        return comments
 
-def _get_lines(file_path):
-    path_to_file = Path(file_path)
-    with path_to_file.open() as f:
-        return f.readlines()
+    @comments.setter
+    def comments(self, comment_block):
+        self._comments = comment_block
 
 
-def _is_top_of_section(codeowners_content):
-    return len(codeowners_content[-1].entries) == 0
+def _iter_lines(source):
+    if isinstance(source, mmap.mmap):
+        for line in iter(source.readline, b''):
+            yield line.decode()
+        return
+    yield from source
 
 
 def _is_empty_line(line):
     return len(line.strip()) == 0
 
 
-def _is_consecutive_blank_line_in_section(codeowners_content):
-    return len(codeowners_content[-1].entries) > 0 and _is_empty_line(
-        codeowners_content[-1].entries[-1].path,
-    )
+def iter_codeowners(source):
+    """
+    Parses CODEOWNERS content line by line, without loading it whole.
+    source: a text file object, any iterable of lines, or an mmap
 
-
-def parse_codeowners(file_path):
+    Yields the CodeownerSection and CodeownerEntry objects in file order,
+    every section before its entries. Sections are yielded with empty
+    entries, and only once their comments are complete.
+    """
     section_regex = re.compile(r'(\^)?\[(.*?)\]')
 
-    codeowners_content = [CodeownerSection(DEFAULT_SECTION, [], [])]
+    section = CodeownerSection(DEFAULT_SECTION, [], [])
+    section_yielded = False
+    entries_count = 0
+    # a blank line is only an entry if another entry follows it in the section
+    pending_blank_entry = None
     comments_block = []
-
-    lines = _get_lines(file_path)
-    for line in lines:
+    # the identical comment blocks of the current section, so that the
+    # memory used does not grow with the number of sections
+    comment_blocks = {}
+
+    def intern_comments(comments_block):
+        if not comments_block:
+            return EMPTY_COMMENTS
+        comments_block = tuple(comments_block)
+        return comment_blocks.setdefault(comments_block, comments_block)
+
+    line_number = 0
+    for line in _iter_lines(source):
+        line_number += 1
         if line.startswith('#'):
             comments_block.append(line.rstrip())
             continue
         if _is_empty_line(line):
-            if _is_top_of_section(codeowners_content):
-                codeowners_content[-1].comments.extend(comments_block)
+            if entries_count == 0:
+                # top of the section
+                section.comments.extend(comments_block)
                 comments_block = []
                 continue
-            if _is_consecutive_blank_line_in_section(codeowners_content):
+            if pending_blank_entry is not None:
                 # we just need 1 consecutive blank line in a section, ignore if more
                 continue
-            # here we have a new blank entry, let's append it
-            codeowners_content[-1].entries.append(
-                CodeownerEntry(line.rstrip(), comments_block),
-            )
+            # here we have a new blank entry, let's keep it until we know it is not trailing
+            pending_blank_entry = CodeownerEntry(
+                line.rstrip(), intern_comments(comments_block), line=line_number)
+            entries_count += 1
             comments_block = []
             continue
         if section_regex.search(line):
@@ -75,25 +152,55 @@ def parse_codeowners(file_path):
             #       A solution could be to create a function that scans all the parsed lines for
             #       trailing comments, both on gitlab sections names and on entries, and appends them to
             #       the proper comment space, CodeownerSection.comments or CodeownerEntry.comments
-            # Here we have a new section
-            codeowners_content.append(
-                CodeownerSection(
-                    line.split(']', 1)[0]+']', comments_block, [],
-                ),
+            # Here we have a new section, the trailing blank line of the previous one is dropped
+            if not section_yielded:
+                yield section
+            section = CodeownerSection(
+                line.split(']', 1)[0]+']', comments_block, [], line_number,
             )
+            section_yielded = False
+            entries_count = 0
+            pending_blank_entry = None
             comments_block = []
+            comment_blocks = {}
             continue
         # if we arrive here it means we have a new entry
-        codeowners_content[-1].entries.append(
-            CodeownerEntry(line.rstrip().split()[
-                0], comments_block, line.rstrip().split()[1:]),
+        if not section_yielded:
+            yield section
+            section_yielded = True
+        if pending_blank_entry is not None:
+            yield pending_blank_entry
+            pending_blank_entry = None
+        path, *owners = line.split()
+        yield CodeownerEntry(
+            path,
+            intern_comments(comments_block),
+            [sys.intern(owner) for owner in owners],
+            line_number,
         )
+        entries_count += 1
         comments_block = []
 
-    # before returning, let's normalize the data by removing the trailing empty line at the end of every section
-    for section in codeowners_content:
-        if section.entries:
-            if _is_empty_line(section.entries[-1].path):
-                section.entries = section.entries[:-1]
+    if not section_yielded:
+        yield section
 
+
+def _count_lines(lines, phase):
+    count = 0
+    for line in lines:
+        count += 1
+        yield line
+    phase.count('lines', count)
+
+
+def parse_codeowners(file_path):
+    codeowners_content = []
+    with profiling.phase('parse') as phase, Path(file_path).open() as f:
+        lines = _count_lines(f, phase) if profiling.is_enabled() else f
+        for item in iter_codeowners(lines):
+            if isinstance(item, CodeownerSection):
+                codeowners_content.append(item)
+            else:
+                codeowners_content[-1].entries.append(item)
+        phase.count('sections', len(codeowners_content))
     return codeowners_content
@@ -0,0 +1,103 @@
+# Existence of literal CODEOWNERS paths (/docs/, src/main.py) answered by
+# looking at the directories on their way with os.scandir, instead of
+# enumerating the whole tree and matching every file.
+from __future__ import annotations
+
+import os
+
+from gitlab_codeowners_linter.ignore import IgnoreRules
+
+# kinds of directory entries, as os.walk sees them: symbolic links to
+# directories are neither files nor walked into
+_FILE = 0
+_DIRECTORY = 1
+_LINKED_DIRECTORY = 2
+
+
+def _kind(entry):
+    if not entry.is_dir():
+        return _FILE
+    if entry.is_symlink():
+        return _LINKED_DIRECTORY
+    return _DIRECTORY
+
+
+class FileProbe:
+    """
+    Finds the first file a literal path matches under root, following the
+    rules of the walk in checks._walk_filepaths: ignored files and
+    directories do not count and symbolic links to directories are not
+    followed. Every directory is listed at most once.
+    """
+
+    def __init__(self, root='.', ignore=None):
+        """
+        root: top of the file tree the paths are relative to
+        ignore: IgnoreRules of root, its .gitignore files only if None
+        """
+        self.root = root
+        self.ignore = ignore if ignore is not None else IgnoreRules(root)
+        # directory -> {name: kind} of its entries not ignored, None if it
+        # cannot be listed
+        self._listings = {}
+        self.listed_directories = 0
+
+    def _list(self, directory):
+        if directory in self._listings:
+            return self._listings[directory]
+        entries = None
+        try:
+            with os.scandir(os.path.join(self.root, directory)) as it:
+                entries = {entry.name: _kind(entry) for entry in it}
+        except OSError:
+            pass
+        if entries is not None:
+            self.listed_directories += 1
+            prefix = os.path.join(directory, '') if directory else ''
+            entries = {
+                name: kind for name, kind in entries.items()
+                if not self.ignore.is_ignored(prefix + name, kind != _FILE)
+            }
+        self._listings[directory] = entries
+        return entries
+
+    def _first_file_under(self, directory):
+        # depth first, so that only the directories on the way to the
+        # first file are listed
+        stack = [directory]
+        while stack:
+            directory = stack.pop()
+            entries = self._list(directory) or {}
+            subdirectories = []
+            for name, kind in entries.items():
+                if kind == _FILE:
+                    return os.path.join(directory, name)
+                if kind == _DIRECTORY:
+                    subdirectories.append(os.path.join(directory, name))
+            stack.extend(reversed(subdirectories))
+        return None
+
+    def first_file(self, path, dir_only=False):
+        """
+        Returns the first file matched by path, a literal path relative to
+        root (the file itself, or any file under the directory), or None if
+        it matches no file
+        dir_only: path only matches the content of a directory
+        """
+        directory = ''
+        components = path.split('/')
+        for name in components[:-1]:
+            entries = self._list(directory)
+            if entries is None or entries.get(name) != _DIRECTORY:
+                return None
+            directory = os.path.join(directory, name)
+        entries = self._list(directory)
+        name = components[-1]
+        if entries is None or name not in entries:
+            return None
+        path = os.path.join(directory, name)
+        if entries[name] == _DIRECTORY:
+            return self._first_file_under(path)
+        if entries[name] == _LINKED_DIRECTORY or dir_only:
+            return None
+        return path
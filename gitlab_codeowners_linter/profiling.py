@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import time
+
+# The active Profiler, None when profiling is disabled
+_profiler = None
+
+
+class _NullPhase:
+    """
+    Phase returned when profiling is disabled: a shared object doing nothing
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def count(self, name, value):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.wall_time = 0.0
+        self.counts = {}
+        self.peak_memory = 0
+        self._start = None
+
+    def __enter__(self):
+        self.profiler._update_peaks()
+        self.profiler._stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall_time += time.perf_counter() - self._start
+        self.profiler._update_peaks()
+        self.profiler._stack.pop()
+        return False
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+
+class Profiler:
+    def __init__(self):
+        self.phases = {}
+        self._stack = []
+
+    def phase(self, name):
+        if name not in self.phases:
+            self.phases[name] = _Phase(self, name)
+        return self.phases[name]
+
+    def _update_peaks(self):
+        # the traced peak is global, fold it into every running phase and
+        # start over so that the next phase only sees its own allocations
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        for running_phase in self._stack:
+            running_phase.peak_memory = max(running_phase.peak_memory, peak)
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    def to_dict(self):
+        return {
+            name: {
+                'wall_time': phase.wall_time,
+                'peak_memory': phase.peak_memory,
+                'counts': phase.counts,
+            }
+            for name, phase in self.phases.items()
+        }
+
+    def write_json(self, file_path):
+        import json
+        with open(file_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_table(self, stream):
+        stream.write(
+            f"{'phase':<20} {'wall time':>12} {'peak memory':>14}  counts\n")
+        for name, phase in self.phases.items():
+            counts = ', '.join(
+                f'{key}={value}' for key, value in phase.counts.items())
+            stream.write(
+                f'{name:<20} {phase.wall_time * 1000:>9.1f} ms '
+                f'{phase.peak_memory / 2**20:>10.1f} MiB  {counts}\n')
+
+
+def enable():
+    # tracemalloc is only loaded by the runs it measures
+    import tracemalloc
+    global _profiler
+    _profiler = Profiler()
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _profiler
+
+
+def disable():
+    import tracemalloc
+    global _profiler
+    _profiler = None
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled():
+    return _profiler is not None
+
+
+def count(phase_name, name, value):
+    """
+    Adds value to the count name of the phase phase_name
+    """
+    if _profiler is None:
+        return
+    _profiler.phase(phase_name).count(name, value)
+
+
+def phase(name):
+    """
+    Returns a context manager timing the phase name, with a count(name, value)
+    method recording the number of items it processed. When profiling is
+    disabled it is a shared object doing nothing.
+    """
+    if _profiler is None:
+        return _NULL_PHASE
+    return _profiler.phase(name)
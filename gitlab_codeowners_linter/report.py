@@ -0,0 +1,241 @@
+# Violations as structured records (rule, section, entry, line, column) and
+# their serialization as JSON, SARIF or GitLab Code Quality reports. The
+# records are written one at a time, a report is never built as a whole.
+from __future__ import annotations
+
+import hashlib
+import json
+
+from gitlab_codeowners_linter.rules import BUILTIN_RULES
+from gitlab_codeowners_linter.rules import get_rule
+from gitlab_codeowners_linter.rules import load_plugin_rules
+from gitlab_codeowners_linter.sorting import path_sort_key
+from gitlab_codeowners_linter.sorting import section_sort_key
+
+OUTPUT_FORMATS = ('text', 'json', 'sarif', 'codequality')
+
+_TOOL_NAME = 'gitlab_codeowners_linter'
+_SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+_SARIF_LEVELS = {'info': 'note', 'minor': 'warning', 'major': 'error'}
+
+
+class Violation:
+    __slots__ = (
+        'rule', 'message', 'file', 'section', 'path', 'line', 'column',
+    )
+
+    def __init__(self, rule, message, file, section=None, path=None, line=0, column=1):
+        """
+        rule: id of the rule, see rules.get_rule
+        file: path of the CODEOWNERS file
+        section: name of the section, None for the whole file
+        path: path of the entry, None for the whole section
+        line: line number of the entry or section header, 0 if unknown
+        column: column of the entry or section header
+        """
+        self.rule = rule
+        self.message = message
+        self.file = file
+        self.section = section
+        self.path = path
+        self.line = line
+        self.column = column
+
+    def to_dict(self):
+        return {
+            'rule': self.rule,
+            'message': self.message,
+            'file': self.file,
+            'section': self.section,
+            'path': self.path,
+            'line': self.line,
+            'column': self.column,
+        }
+
+
+def _iter_section_records(codeowners_data, violations, file):
+    if violations.section_names_sorted:
+        previous_key = None
+        # the default section is not part of the ordering
+        for section in codeowners_data[1:]:
+            key = section_sort_key(section)
+            if previous_key is not None and previous_key > key:
+                yield Violation(
+                    'unsorted-sections',
+                    f'Section {section.codeowner_section} is not in alphabetical order',
+                    file, section.codeowner_section, line=section.line)
+                break
+            previous_key = key
+    if violations.duplicated_sections:
+        seen = set()
+        for section in codeowners_data:
+            name = section.codeowner_section.lstrip('^').lower()
+            if name in seen:
+                yield Violation(
+                    'duplicated-section',
+                    f'Section {section.codeowner_section} is a duplicate',
+                    file, section.codeowner_section, line=section.line)
+            seen.add(name)
+
+
+def _iter_entry_records(section, violations, file):
+    name = section.codeowner_section
+    if name in violations.sections_with_blank_lines:
+        for entry in section.entries:
+            if not entry.path:
+                yield Violation(
+                    'blank-line', f'Blank line in section {name}',
+                    file, name, entry.path, entry.line)
+    if name in violations.unsorted_paths_in_sections:
+        previous_key = None
+        for entry in section.entries:
+            if not entry.path:
+                continue
+            key = path_sort_key(entry)
+            if previous_key is not None and previous_key > key:
+                yield Violation(
+                    'unsorted-paths',
+                    f'Path {entry.path} of section {name} is not in alphabetical order',
+                    file, name, entry.path, entry.line)
+                break
+            previous_key = key
+    if name in violations.sections_with_duplicate_paths:
+        seen = set()
+        for entry in section.entries:
+            if entry.path and entry.path in seen:
+                yield Violation(
+                    'duplicated-path',
+                    f'Path {entry.path} is a duplicate in section {name}',
+                    file, name, entry.path, entry.line)
+            seen.add(entry.path)
+    if name in violations.sections_with_non_existing_paths:
+        non_existing_paths = set(
+            violations.non_existing_paths.get(name.lower(), ()))
+        for entry in section.entries:
+            if entry.path and entry.path in non_existing_paths:
+                yield Violation(
+                    'non-existing-path',
+                    f'Path {entry.path} of section {name} matches no file',
+                    file, name, entry.path, entry.line)
+    if name in violations.sections_with_shadowed_entries:
+        shadowed_entries = set(
+            violations.shadowed_entries.get(name.lower(), ()))
+        for entry in section.entries:
+            if entry.path in shadowed_entries:
+                yield Violation(
+                    'shadowed-entry',
+                    f'Path {entry.path} of section {name} is overridden by later entries for all its files',
+                    file, name, entry.path, entry.line)
+
+
+def iter_violations(codeowners_data, violations, file, min_coverage=None):
+    """
+    Yields a Violation for every problem found in codeowners_data, the
+    content of file checked with checks.check
+    """
+    yield from _iter_section_records(codeowners_data, violations, file)
+    for section in codeowners_data:
+        yield from _iter_entry_records(section, violations, file)
+    for section, entry, owner, suggestion in violations.unknown_owners:
+        message = f'Owner {owner} of path {entry.path} is unknown'
+        if suggestion is not None:
+            message += f', did you mean {suggestion}?'
+        yield Violation(
+            'unknown-owner', message, file, section.codeowner_section,
+            entry.path, entry.line)
+    for rule_id, message, section, entry in violations.plugin_violations:
+        record = Violation(rule_id, message, file)
+        if section is not None:
+            record.section = section.codeowner_section
+            record.line = section.line
+        if entry is not None:
+            record.path = entry.path
+            record.line = entry.line
+        yield record
+    if min_coverage is not None and violations.coverage is not None and violations.coverage < min_coverage:
+        yield Violation(
+            'coverage',
+            f'{violations.coverage:.2f}% of the files are matched by a path, below the minimum of {min_coverage:g}%',
+            file)
+
+
+def write_json(records, stream):
+    stream.write('[')
+    for i, record in enumerate(records):
+        stream.write(',\n' if i else '\n')
+        stream.write(json.dumps(record.to_dict()))
+    stream.write('\n]\n')
+
+
+def _fingerprint(record, occurrences):
+    # stable across runs as long as the entry is there, even if it moves
+    key = (record.rule, record.file, record.section, record.path)
+    occurrences[key] = occurrences.get(key, 0) + 1
+    return hashlib.sha1(
+        json.dumps([*key, occurrences[key]]).encode()).hexdigest()
+
+
+def write_codequality(records, stream):
+    occurrences = {}
+    stream.write('[')
+    for i, record in enumerate(records):
+        stream.write(',\n' if i else '\n')
+        stream.write(json.dumps({
+            'description': record.message,
+            'check_name': record.rule,
+            'fingerprint': _fingerprint(record, occurrences),
+            'severity': get_rule(record.rule).severity,
+            'location': {
+                'path': record.file,
+                'lines': {'begin': max(record.line, 1)},
+            },
+        }))
+    stream.write('\n]\n')
+
+
+def _get_reported_rules():
+    rules = list(BUILTIN_RULES.values())
+    # the plugins are only loaded when plugin rules were selected
+    if load_plugin_rules.cache_info().currsize:
+        rules.extend(load_plugin_rules().values())
+    return rules
+
+
+def write_sarif(records, stream):
+    header = json.dumps({
+        'version': '2.1.0',
+        '$schema': _SARIF_SCHEMA,
+        'runs': [{
+            'tool': {'driver': {
+                'name': _TOOL_NAME,
+                'rules': [
+                    {'id': rule.id, 'shortDescription': {'text': rule.description}}
+                    for rule in _get_reported_rules()
+                ],
+            }},
+            'results': [],
+        }],
+    })
+    # stream the results into the empty array of the header
+    head, tail = header.rsplit('[]', 1)
+    stream.write(head + '[')
+    for i, record in enumerate(records):
+        stream.write(',\n' if i else '\n')
+        location = {'artifactLocation': {'uri': record.file}}
+        if record.line:
+            location['region'] = {
+                'startLine': record.line, 'startColumn': record.column}
+        stream.write(json.dumps({
+            'ruleId': record.rule,
+            'level': _SARIF_LEVELS[get_rule(record.rule).severity],
+            'message': {'text': record.message},
+            'locations': [{'physicalLocation': location}],
+        }))
+    stream.write('\n]' + tail + '\n')
+
+
+WRITERS = {
+    'json': write_json,
+    'sarif': write_sarif,
+    'codequality': write_codequality,
+}
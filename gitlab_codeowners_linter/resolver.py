@@ -0,0 +1,155 @@
+# Answer "who owns these files": for every file, the entry of each section
+# that applies to it, following GitLab's semantics where the last matching
+# entry of a section wins and sections with the same name are combined.
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+from gitlab_codeowners_linter.input import find_codeowners_file
+from gitlab_codeowners_linter.matching import PatternIndex
+from gitlab_codeowners_linter.parser import parse_codeowners
+
+
+class Ownership:
+    __slots__ = ('section', 'optional', 'entry')
+
+    def __init__(self, section, optional, entry):
+        """
+        section: name of the section, without the optional marker
+        optional: the approval of the section is optional
+        entry: the CodeownerEntry of the section matching the file
+        """
+        self.section = section
+        self.optional = optional
+        self.entry = entry
+
+    def to_dict(self):
+        return {
+            'section': self.section,
+            'optional': self.optional,
+            'path': self.entry.path,
+            'owners': list(self.entry.owners),
+        }
+
+
+class OwnershipResolver:
+    """
+    Resolves the owners of many files with a single PatternIndex over all
+    the CODEOWNERS paths, so that every file is classified once instead of
+    being matched against every entry. Files matched by the same paths,
+    typically the files of a directory, share their resolution.
+    """
+
+    def __init__(self, codeowners_data):
+        """
+        codeowners_data: the parsed CODEOWNERS file, see parser.parse_codeowners
+        """
+        # (name, optional) of every section, sections with the same name
+        # (case insensitive) are combined
+        self._sections = []
+        section_ids = {}
+        self._entries = []
+        # path -> [(section id, entry id)], entry ids grow in file order
+        self._rules = {}
+        for section in codeowners_data:
+            name = section.codeowner_section
+            optional = name.startswith('^')
+            if optional:
+                name = name[1:]
+            section_id = section_ids.get(name.lower())
+            if section_id is None:
+                section_id = section_ids[name.lower()] = len(self._sections)
+                self._sections.append((name, optional))
+            for entry in section.entries:
+                if not entry.path:
+                    continue
+                self._rules.setdefault(entry.path, []).append(
+                    (section_id, len(self._entries)))
+                self._entries.append(entry)
+        self.index = PatternIndex(self._rules)
+        # matching paths -> resolution
+        self._resolved = {}
+
+    def resolve(self, path):
+        """
+        Returns the Ownership of every section with an entry matching path,
+        in section order
+        """
+        return self.resolve_patterns(tuple(self.index.match(path)))
+
+    def resolve_patterns(self, patterns):
+        """
+        Returns the Ownership of every section for a file matching exactly
+        patterns, a tuple of CODEOWNERS paths in the order of index.patterns
+        """
+        resolved = self._resolved.get(patterns)
+        if resolved is None:
+            last_entries = {}
+            for pattern in patterns:
+                for section_id, entry_id in self._rules[pattern]:
+                    if entry_id > last_entries.get(section_id, -1):
+                        last_entries[section_id] = entry_id
+            resolved = self._resolved[patterns] = tuple(
+                Ownership(*self._sections[section_id], self._entries[entry_id])
+                for section_id, entry_id in sorted(last_entries.items())
+            )
+        return resolved
+
+    def resolve_many(self, paths):
+        """
+        Yields (path, ownerships) for every path, see resolve
+        """
+        for path in paths:
+            yield path, self.resolve(path)
+
+
+def _normalize_path(path):
+    path = path.strip()
+    if path.startswith('./'):
+        path = path[2:]
+    return path.lstrip('/')
+
+
+def _parse_arguments(args):
+    parser = argparse.ArgumentParser(
+        description='Print the codeowners of files as JSON lines')
+    parser.add_argument('paths', nargs='*',
+                        help='files to resolve, read from stdin (one per line) if none or -')
+    parser.add_argument('--codeowners_file', required=False,
+                        help='path to the codeowners file, searched in the current directory by default')
+    parser.add_argument('--output', required=False,
+                        help='write the results to this file instead of stdout')
+    return parser.parse_args(args)
+
+
+def main():
+    args = _parse_arguments(sys.argv[1:])
+    codeowners_file = args.codeowners_file or find_codeowners_file('.')
+    if codeowners_file is None:
+        sys.exit('No CODEOWNERS file found, use --codeowners_file')
+    resolver = OwnershipResolver(parse_codeowners(codeowners_file))
+    if not args.paths or args.paths == ['-']:
+        lines = sys.stdin
+    else:
+        lines = args.paths
+    paths = (_normalize_path(line) for line in lines if line.strip())
+    output = open(args.output, 'w') if args.output else sys.stdout
+    # files sharing their resolution share its encoding as well
+    encoded_ownerships = {}
+    try:
+        for path, ownerships in resolver.resolve_many(paths):
+            encoded = encoded_ownerships.get(ownerships)
+            if encoded is None:
+                encoded = encoded_ownerships[ownerships] = json.dumps(
+                    [ownership.to_dict() for ownership in ownerships])
+            output.write(
+                f'{{"file": {json.dumps(path)}, "owners": {encoded}}}\n')
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# The registry of the rules the linter checks: the built-in ones and the
+# rules of plugins, registered as entry points of the group PLUGIN_GROUP.
+# Every rule has a cost tier, so that a run can select the cheap rules only
+# and skip enumerating the files of the tree.
+from __future__ import annotations
+
+import functools
+
+# rules only reading the CODEOWNERS file
+FORMATTING = 'formatting'
+# rules matching the CODEOWNERS paths against the files of the tree
+FILES = 'files'
+TIERS = (FORMATTING, FILES)
+
+# selects every rule on by default, the ones of the plugins included
+ALL = 'all'
+
+PLUGIN_GROUP = 'gitlab_codeowners_linter.rules'
+
+
+class Rule:
+    __slots__ = ('id', 'description', 'tier', 'severity', 'default', 'check')
+
+    def __init__(self, id, description, tier=FORMATTING, severity='major', default=True, check=None):
+        """
+        id: name of the rule in --select, --ignore and the reports
+        description: what the rule requires, in a sentence
+        tier: FORMATTING or FILES, FILES rules need the files of the tree
+        severity: 'info', 'minor' or 'major'
+        default: the rule runs when no rule is selected explicitly
+        check: for plugin rules, function(codeowners_data, files) yielding
+        (message, section, entry) for every violation, where files is the
+        list of the files of the tree for FILES rules and None otherwise,
+        and section (CodeownerSection) and entry (CodeownerEntry) locate
+        the violation or are None
+        """
+        self.id = id
+        self.description = description
+        self.tier = tier
+        self.severity = severity
+        self.default = default
+        self.check = check
+
+
+BUILTIN_RULES = {rule.id: rule for rule in [
+    Rule('unsorted-sections', 'Sections must be sorted alphabetically',
+         severity='minor'),
+    Rule('duplicated-section', 'Sections must be unique'),
+    Rule('blank-line', 'There must be no blank lines between the paths of a section',
+         severity='info'),
+    Rule('unsorted-paths', 'The paths of a section must be sorted alphabetically',
+         severity='minor'),
+    Rule('duplicated-path', 'The paths of a section must be unique'),
+    Rule('non-existing-path', 'Paths must match at least one file', FILES),
+    # enabled by --owners_snapshot
+    Rule('unknown-owner', 'Owners must be known users, groups or emails',
+         default=False),
+    # enabled by --check_shadowed
+    Rule('shadowed-entry', 'Entries must apply to at least one file', FILES,
+         severity='minor', default=False),
+    # enabled by --min_coverage and --coverage_report
+    Rule('coverage', 'Enough files must be matched by a path', FILES,
+         default=False),
+]}
+
+
+@functools.lru_cache(maxsize=None)
+def load_plugin_rules():
+    """
+    Returns the rules registered by the installed plugins, by id. Every
+    entry point of PLUGIN_GROUP is a Rule, or a function returning one.
+    """
+    # scanning the installed distributions takes tens of milliseconds, it
+    # only happens when plugin rules are selected
+    from importlib.metadata import entry_points
+    found = entry_points()
+    if hasattr(found, 'select'):
+        found = found.select(group=PLUGIN_GROUP)
+    else:
+        found = found.get(PLUGIN_GROUP, ())
+    plugin_rules = {}
+    for entry_point in found:
+        rule = entry_point.load()
+        if not isinstance(rule, Rule):
+            rule = rule()
+        if rule.id in BUILTIN_RULES or rule.id in TIERS or rule.id == ALL:
+            raise ValueError(
+                f'The plugin rule {rule.id} of {entry_point.value} clashes with a built-in name')
+        plugin_rules[rule.id] = rule
+    return plugin_rules
+
+
+def get_rule(rule_id):
+    """
+    Returns the built-in or plugin rule rule_id
+    """
+    rule = BUILTIN_RULES.get(rule_id)
+    if rule is None:
+        rule = load_plugin_rules()[rule_id]
+    return rule
+
+
+def _expand(names, rules, defaults_only=True):
+    """
+    defaults_only: ALL and the tiers only stand for the rules on by default
+    """
+    selected = set()
+    for name in names:
+        if name == ALL:
+            selected.update(
+                rule_id for rule_id, rule in rules.items()
+                if rule.default or not defaults_only)
+        elif name in TIERS:
+            selected.update(
+                rule_id for rule_id, rule in rules.items()
+                if rule.tier == name and (rule.default or not defaults_only))
+        elif name in rules:
+            selected.add(name)
+        else:
+            raise ValueError(f'Unknown rule {name}')
+    return selected
+
+
+def select_rules(select=None, ignore=(), enabled=()):
+    """
+    Returns the rules to run, by id, in registry order
+    select: rule ids, tiers or ALL, the default rules if None. A tier or
+    ALL selects the rules it holds that are on by default.
+    ignore: rule ids or tiers removed from the selection
+    enabled: rule ids added to the selection, e.g. by their own options
+    """
+    names = [*(select or ()), *ignore]
+    rules = BUILTIN_RULES
+    # plugins are only loaded when the selection names them
+    if any(name not in BUILTIN_RULES and name not in TIERS for name in names):
+        rules = {**BUILTIN_RULES, **load_plugin_rules()}
+    if select is None:
+        selected = {rule_id for rule_id, rule in rules.items() if rule.default}
+    else:
+        selected = _expand(select, rules)
+    selected.update(enabled)
+    selected -= _expand(ignore, rules, defaults_only=False)
+    return {rule_id: rule for rule_id, rule in rules.items() if rule_id in selected}
@@ -2,42 +2,46 @@ from __future__ import annotations
 
 import re
 
+_SECTION_NAME = re.compile(r'\[([^]]*)\]')
 
-def sort_paths(entry1, entry2):
-    line1 = entry1.path.lower()
-    line2 = entry2.path.lower()
-    if len(line1) == 0 or len(line2) == 0:
-        return 0
-    if line1.startswith('*') and line2.startswith('*'):
-        return -1 if (line1 < line2) else 1
-    if line1.startswith('*'):
+# paths starting with * come first, then relative paths, then absolute paths.
+# Blank paths are not part of the ordering, they sort before everything
+_BLANK_PATH = -1
+_WILDCARD_PATH = 0
+_RELATIVE_PATH = 1
+_ABSOLUTE_PATH = 2
+
+
+def path_sort_key(entry):
+    path = entry.path.lower()
+    if len(path) == 0:
+        return (_BLANK_PATH, path)
+    if path.startswith('*'):
+        return (_WILDCARD_PATH, path)
+    if path.startswith('/'):
+        return (_ABSOLUTE_PATH, path)
+    return (_RELATIVE_PATH, path)
+
+
+def section_sort_key(section):
+    section_name = _SECTION_NAME.search(
+        section.codeowner_section).group(1).lower()
+    # optional sections (^[Section]) come before the required ones
+    is_optional = section.codeowner_section.startswith('^')
+    return (section_name, not is_optional)
+
+
+def _compare_keys(key1, key2):
+    if key1 < key2:
         return -1
-    if line2.startswith('*'):
-        return 1
-    if line1.startswith('/') and line2.startswith('/'):
-        return -1 if (line1 < line2) else 1
-    if line1.startswith('/'):
+    if key1 > key2:
         return 1
-    if line2.startswith('/'):
-        return -1
+    return 0
 
-    return -1 if (line1 < line2) else 1
+
+def sort_paths(entry1, entry2):
+    return _compare_keys(path_sort_key(entry1), path_sort_key(entry2))
 
 
 def sort_section_names(section1, section2):
-    section_name1 = re.search(re.compile(
-        r'\[([^]]*)\]'), section1.codeowner_section).group(1).lower()
-    section_name2 = re.search(re.compile(
-        r'\[([^]]*)\]'), section2.codeowner_section).group(1).lower()
-    is_section_1_optional = section1.codeowner_section.startswith('^')
-    is_section_2_optional = section2.codeowner_section.startswith('^')
-
-    if section_name1 == section_name2:
-        if is_section_1_optional and is_section_2_optional:
-            return 0
-        if is_section_1_optional:
-            return -1
-        if is_section_2_optional:
-            return 1
-        return 0
-    return -1 if (section_name1 < section_name2) else 1
+    return _compare_keys(section_sort_key(section1), section_sort_key(section2))
@@ -1,19 +1,58 @@
 from __future__ import annotations
 
+import json
+import mmap
 import os
 import shutil
+import struct
+import subprocess
+import sys
 import tempfile
+import threading
 import unittest
 from dataclasses import dataclass
 from functools import cmp_to_key
 from pathlib import Path
 from unittest.mock import patch
 
+from pathspec import PathSpec
+
 import gitlab_codeowners_linter  # we need the full import for the mock
+from gitlab_codeowners_linter import profiling
+from gitlab_codeowners_linter.batch import lint_repositories
+from gitlab_codeowners_linter.cache import get_tree_fingerprint
+from gitlab_codeowners_linter.cache import load_pattern_translations
+from gitlab_codeowners_linter.checks import check
+from gitlab_codeowners_linter.checks import check_stream
+from gitlab_codeowners_linter.checks import scan_codeowners
+from gitlab_codeowners_linter.codeowners_linter import _use_daemon
+from gitlab_codeowners_linter.codeowners_linter import lint_all_codeowners_files
 from gitlab_codeowners_linter.codeowners_linter import lint_codeowners_file
+from gitlab_codeowners_linter.codeowners_linter import OwnersList
+from gitlab_codeowners_linter.coverage import compute_coverage
+from gitlab_codeowners_linter.daemon import _open_inotify
+from gitlab_codeowners_linter.daemon import FileIndex
+from gitlab_codeowners_linter.daemon import LintDaemon
+from gitlab_codeowners_linter.daemon_client import request_lint
+from gitlab_codeowners_linter.git_index import read_tracked_files
 from gitlab_codeowners_linter.input import get_arguments
+from gitlab_codeowners_linter.input import get_options
+from gitlab_codeowners_linter.matching import compile_pattern
+from gitlab_codeowners_linter.matching import find_existing
+from gitlab_codeowners_linter.matching import PatternIndex
+from gitlab_codeowners_linter.options import LintOptions
 from gitlab_codeowners_linter.parser import CodeownerEntry
 from gitlab_codeowners_linter.parser import CodeownerSection
+from gitlab_codeowners_linter.parser import parse_codeowners
+from gitlab_codeowners_linter.report import iter_violations
+from gitlab_codeowners_linter.report import write_codequality
+from gitlab_codeowners_linter.report import write_sarif
+from gitlab_codeowners_linter.resolver import OwnershipResolver
+from gitlab_codeowners_linter.rules import FILES
+from gitlab_codeowners_linter.rules import Rule
+from gitlab_codeowners_linter.rules import select_rules
+from gitlab_codeowners_linter.sorting import path_sort_key
+from gitlab_codeowners_linter.sorting import section_sort_key
 from gitlab_codeowners_linter.sorting import sort_paths
 from gitlab_codeowners_linter.sorting import sort_section_names
 
@@ -125,17 +164,18 @@ class Test_Functions(unittest.TestCase):
             actual = data
             for section in case.input:
                 data.append(CodeownerSection(section, [], []))
-            actual = sorted(data, key=sort_section_key)
-            actual_names = [x.codeowner_section for x in actual]
-            self.assertListEqual(
-                case.expected,
-                actual_names,
-                'failed test {} expected {}, actual {}'.format(
-                    case.name,
+            for key in (sort_section_key, section_sort_key):
+                actual = sorted(data, key=key)
+                actual_names = [x.codeowner_section for x in actual]
+                self.assertListEqual(
                     case.expected,
                     actual_names,
-                ),
-            )
+                    'failed test {} expected {}, actual {}'.format(
+                        case.name,
+                        case.expected,
+                        actual_names,
+                    ),
+                )
 
     def test_sort_path_function(self):
         @dataclass
@@ -224,16 +264,1001 @@ class Test_Functions(unittest.TestCase):
             actual = data
             for path in case.input:
                 data.entries.append(CodeownerEntry(path, ''))
-            actual.entries = sorted(data.entries, key=sort_paths_key)
-            self.assertListEqual(
-                case.expected,
-                actual.get_paths(),
-                'failed test {} expected {}, actual {}'.format(
-                    case.name,
+            for key in (sort_paths_key, path_sort_key):
+                actual.entries = sorted(data.entries, key=key)
+                self.assertListEqual(
                     case.expected,
                     actual.get_paths(),
+                    'failed test {} expected {}, actual {}'.format(
+                        case.name,
+                        case.expected,
+                        actual.get_paths(),
+                    ),
+                )
+
+    def test_pattern_index(self):
+        patterns = [
+            '*', '*.md', '/*.md', 'README.md', '/README.md', 'docs/',
+            '/docs/', 'docs', '/src/app/', 'src/app', 'src/app/main.py',
+            '/src/**/test_*.py', '**/lib', 'lib/', 'app', r'\#notes.txt',
+            '!docs', 'src/*/main.py', '', '/', 'missing', '/missing/dir/',
+        ]
+        files = [
+            'README.md', 'docs/README.md', 'docs/guide/index.md',
+            'src/app/main.py', 'src/app/lib/util.py', 'src/tests/test_app.py',
+            'vendor/docs', 'vendor/lib/x.c', 'lib', '#notes.txt', 'app',
+            'other/app/file', 'src/docs/nested/file.txt',
+        ]
+        index = PatternIndex(patterns)
+        for path in files:
+            expected = [
+                pattern for pattern in patterns
+                if pattern not in ('', '/')
+                and PathSpec.from_lines('gitwildmatch', [pattern]).patterns[0].regex.match(path)
+            ]
+            self.assertListEqual(
+                expected,
+                index.match(path),
+                'failed test {} expected {}, actual {}'.format(
+                    path,
+                    expected,
+                    index.match(path),
                 ),
             )
+        existing = index.find_existing(files)
+        self.assertEqual(
+            sorted(existing),
+            sorted(
+                p for p in patterns
+                if p not in ('', '/', 'missing', '/missing/dir/')
+            ),
+        )
+        self.assertEqual(existing['/src/app/'], 'src/app/main.py')
+
+    def test_parallel_existence(self):
+        patterns = ['*.md', '/src/', 'lib/', 'missing', '*.py', '/docs/']
+        files = ['README.md', 'src/lib/a.py', 'docs/guide.md', 'src/main.c']
+        self.assertEqual(
+            find_existing(patterns, files, jobs=3),
+            find_existing(patterns, files),
+        )
+        self.assertListEqual(
+            list(find_existing(patterns, files, jobs=3)),
+            ['*.md', '/src/', 'lib/', '*.py', '/docs/'],
+        )
+
+    def test_git_index(self):
+        def index_entry(name, mode=0o100644, stage=0):
+            flags = (stage << 12) | len(name)
+            entry = struct.pack('>24xL12x20xH', mode, flags) + name
+            return entry + b'\0' * (8 - len(entry) % 8)
+
+        entries = [
+            index_entry(b'README.md'),
+            index_entry(b'conflict.txt', stage=1),
+            index_entry(b'conflict.txt', stage=2),
+            index_entry(b'docs/guide/index.md'),
+            index_entry(b'vendor/submodule', mode=0o160000),
+        ]
+        submodule_entries = [index_entry(b'lib.py')]
+        for git_dir, index_entries in [
+            (os.path.join(self.test_dir, '.git'), entries),
+            (
+                os.path.join(self.test_dir, 'vendor', 'submodule', '.git'),
+                submodule_entries,
+            ),
+        ]:
+            os.makedirs(git_dir)
+            with open(os.path.join(git_dir, 'index'), 'wb') as f:
+                f.write(struct.pack('>4sLL', b'DIRC', 2, len(index_entries)))
+                f.write(b''.join(index_entries))
+                f.write(b'\0' * 20)
+
+        self.assertListEqual(
+            read_tracked_files(self.test_dir),
+            ['README.md', 'conflict.txt', 'docs/guide/index.md'],
+        )
+        self.assertListEqual(
+            read_tracked_files(self.test_dir, nested=True),
+            ['README.md', 'conflict.txt', 'docs/guide/index.md',
+                'vendor/submodule/lib.py'],
+        )
+        self.assertIsNone(read_tracked_files(
+            os.path.join(self.test_dir, 'docs')))
+
+        # an index that cannot be read falls back to walking the work tree,
+        # without the git directory
+        with open(os.path.join(self.test_dir, '.git', 'index'), 'wb') as f:
+            f.write(b'DIRC')
+        self.assertListEqual(
+            gitlab_codeowners_linter.checks._get_all_filepaths(self.test_dir), [])
+
+    def test_split_git_index(self):
+        if shutil.which('git') is None:
+            self.skipTest('git is not installed')
+
+        def git(*args):
+            return subprocess.run(
+                ['git', '-C', self.test_dir, *args],
+                check=True, capture_output=True, text=True).stdout
+
+        for index in range(8):
+            Path(self.test_dir, 'src', f'f{index}').parent.mkdir(exist_ok=True)
+            Path(self.test_dir, 'src', f'f{index}').write_text(str(index))
+        git('init', '-q')
+        git('add', '.')
+        git('update-index', '--split-index')
+        # the changes after the split only land in the split index
+        Path(self.test_dir, 'src', 'f6').write_text('changed')
+        Path(self.test_dir, 'src', 'new').write_text('new')
+        git('add', 'src/f6', 'src/new')
+        git('rm', '-q', '--cached', 'src/f2')
+
+        index = Path(self.test_dir, '.git', 'index').read_bytes()
+        self.assertIn(b'link', index)
+        self.assertListEqual(
+            read_tracked_files(self.test_dir),
+            git('ls-files').splitlines(),
+        )
+
+    def test_ignored_files(self):
+        for path, content in [
+            ('.gitignore', 'build/\n*.log\n!keep.log\n'),
+            ('build/out.o', ''),
+            ('app/.gitignore', '# generated code\ngenerated\n'),
+            ('app/main.py', ''),
+            ('app/debug.log', ''),
+            ('app/keep.log', ''),
+            ('app/generated/api.py', ''),
+            ('lib/generated/api.py', ''),
+            ('node_modules/left-pad/index.js', ''),
+        ]:
+            path = os.path.join(self.test_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+
+        walked = []
+        os_walk = os.walk
+
+        def walk(top):
+            for dirpath, dirs, files in os_walk(top):
+                walked.append(os.path.relpath(dirpath, self.test_dir))
+                yield dirpath, dirs, files
+
+        with patch('gitlab_codeowners_linter.checks.os.walk', walk):
+            files = gitlab_codeowners_linter.checks._get_all_filepaths(
+                self.test_dir, exclude=['node_modules/'])
+        self.assertListEqual(sorted(files), [
+            '.gitignore', 'app/.gitignore', 'app/keep.log', 'app/main.py',
+            'lib/generated/api.py'])
+        # the ignored directories are not walked at all
+        self.assertListEqual(
+            sorted(walked), ['.', 'app', 'lib', 'lib/generated'])
+
+    def test_existence_probe(self):
+        for path, content in [
+            ('.gitignore', 'build/\n'),
+            ('build/out.o', ''),
+            ('docs/guide/index.md', ''),
+            ('src/main.py', ''),
+        ]:
+            path = os.path.join(self.test_dir, path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as f:
+                f.write(content)
+        os.symlink(os.path.join(self.test_dir, 'src'),
+                   os.path.join(self.test_dir, 'link'))
+        paths = ['/docs/', 'src/main.py', '/build/', '/missing', '/link/',
+                 '/src/main.py/', '/src/Main.py']
+        expected = {
+            '/docs/': 'docs/guide/index.md',
+            'src/main.py': 'src/main.py',
+        }
+        options = LintOptions(root=self.test_dir)
+
+        # literal paths never walk the tree
+        with patch('gitlab_codeowners_linter.checks.os.walk') as walk:
+            existing = gitlab_codeowners_linter.checks._get_existing_paths(
+                paths, options)
+            walk.assert_not_called()
+        self.assertDictEqual(existing, expected)
+        # same results as matching the files of the walk
+        files = gitlab_codeowners_linter.checks._walk_filepaths(self.test_dir)
+        self.assertDictEqual(find_existing(paths, files), expected)
+
+        # the walk stops at the first file matching the other paths
+        with patch('gitlab_codeowners_linter.checks.os.walk', wraps=os.walk) as walk:
+            existing = gitlab_codeowners_linter.checks._get_existing_paths(
+                ['*.md', '/docs/'], options)
+            walk.assert_called_once()
+        self.assertDictEqual(existing, {
+            '*.md': 'docs/guide/index.md',
+            '/docs/': 'docs/guide/index.md',
+        })
+
+    def test_blank_line_existence(self):
+        for path in ['a', 'b']:
+            open(os.path.join(self.test_dir, path), 'w').close()
+        codeowners_file = os.path.join(self.test_dir, 'CODEOWNERS')
+        with open(codeowners_file, 'w') as f:
+            f.write('a @x\n\nb @y\n')
+
+        violations = check(
+            parse_codeowners(codeowners_file), LintOptions(root=self.test_dir))
+        # blank lines are not paths to look for
+        self.assertListEqual(
+            violations.violation_error_messages,
+            ['There are blank lines in the sections __default_codeowner_section__'],
+        )
+        self.assertDictEqual(
+            violations.non_existing_paths, {'__default_codeowner_section__': []})
+
+    def test_existence_cache(self):
+        codeowners_data = [CodeownerSection('[Test]', [], [
+            CodeownerEntry('tests/', []),
+            CodeownerEntry('/missing/', []),
+        ])]
+        options = LintOptions(cache_dir=self.test_dir)
+        expected = (['[Test]'], {'[test]': ['/missing/']})
+
+        cold = gitlab_codeowners_linter.checks._get_non_existing_paths(
+            codeowners_data, options)
+        self.assertEqual(cold, expected)
+        # a warm run answers from the cache without enumerating the files
+        with patch('gitlab_codeowners_linter.checks._get_all_filepaths') as files:
+            warm = gitlab_codeowners_linter.checks._get_non_existing_paths(
+                codeowners_data, options)
+            files.assert_not_called()
+        self.assertEqual(warm, expected)
+
+        # a new pattern is not in the cache yet
+        codeowners_data[0].entries.append(CodeownerEntry('/README.md', []))
+        with patch('gitlab_codeowners_linter.checks._get_all_filepaths') as files:
+            files.return_value = ['README.md']
+            gitlab_codeowners_linter.checks._get_non_existing_paths(
+                codeowners_data, options)
+            files.assert_called_once()
+
+    def test_tree_fingerprint(self):
+        os.makedirs(os.path.join(self.test_dir, 'node_modules', 'lib'))
+        os.makedirs(os.path.join(self.test_dir, 'src'))
+        gitignore = os.path.join(self.test_dir, '.gitignore')
+        with open(gitignore, 'w') as f:
+            f.write('node_modules/\n')
+        fingerprint = get_tree_fingerprint(self.test_dir)
+
+        # ignored directories are not walked
+        with patch('os.stat', wraps=os.stat) as stat:
+            get_tree_fingerprint(self.test_dir)
+            self.assertNotIn(
+                os.path.join(self.test_dir, 'node_modules', ''),
+                [os.path.join(call.args[0], '') for call in stat.call_args_list])
+        Path(self.test_dir, 'node_modules', 'lib', 'index.js').touch()
+        self.assertEqual(get_tree_fingerprint(self.test_dir), fingerprint)
+        self.assertNotEqual(
+            get_tree_fingerprint(self.test_dir, ['src/']), fingerprint)
+
+        # editing a .gitignore in place changes the files checked
+        stat = os.stat(self.test_dir)
+        with open(gitignore, 'w') as f:
+            f.write('dist/\n')
+        os.utime(self.test_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertNotEqual(get_tree_fingerprint(self.test_dir), fingerprint)
+
+        # with index.skipHash the checksum of the git index is zeroed
+        os.makedirs(os.path.join(self.test_dir, '.git'))
+        index_path = os.path.join(self.test_dir, '.git', 'index')
+        with open(index_path, 'wb') as f:
+            f.write(struct.pack('>4sLL', b'DIRC', 2, 0) + bytes(20))
+        fingerprint = get_tree_fingerprint(self.test_dir)
+        self.assertEqual(get_tree_fingerprint(self.test_dir), fingerprint)
+        with open(index_path, 'wb') as f:
+            f.write(struct.pack('>4sLL', b'DIRC', 2, 0) + b'TREE' + bytes(24))
+        self.assertNotEqual(get_tree_fingerprint(self.test_dir), fingerprint)
+
+    def test_pattern_compilation_cache(self):
+        self.assertIs(compile_pattern('/docs/**/*.md'),
+                      compile_pattern('/docs/**/*.md'))
+
+        codeowners_data = [CodeownerSection('[Test]', [], [
+            CodeownerEntry('/compiled/*/*.md', []),
+            CodeownerEntry('compiled/', []),
+        ])]
+        gitlab_codeowners_linter.checks._get_non_existing_paths(
+            codeowners_data, LintOptions(cache_dir=self.test_dir))
+        translations = load_pattern_translations(self.test_dir)
+        self.assertEqual(
+            translations['/compiled/*/*.md'],
+            compile_pattern('/compiled/*/*.md').regex,
+        )
+        self.assertIn('compiled/', translations)
+
+    def test_incremental_existence(self):
+        codeowners_data = [CodeownerSection('[Test]', [], [
+            CodeownerEntry('a/', []),
+            CodeownerEntry('*.md', []),
+            CodeownerEntry('/c/', []),
+        ])]
+        with patch('gitlab_codeowners_linter.checks._get_all_filepaths') as files, \
+                patch('gitlab_codeowners_linter.checks.get_tree_fingerprint') as fingerprint:
+            files.return_value = ['a/x.py', 'b/y.md']
+            fingerprint.return_value = 'first'
+            first = gitlab_codeowners_linter.checks._get_non_existing_paths(
+                codeowners_data, LintOptions(cache_dir=self.test_dir, incremental=True))
+        self.assertEqual(first, (['[Test]'], {'[test]': ['/c/']}))
+
+        # b/y.md was deleted and c/new.txt added since the first run
+        options = LintOptions(
+            cache_dir=self.test_dir,
+            incremental=True,
+            changed_files=['c/new.txt'],
+        )
+        with patch('gitlab_codeowners_linter.checks._get_all_filepaths') as files, \
+                patch('gitlab_codeowners_linter.checks.get_tree_fingerprint') as fingerprint, \
+                patch('gitlab_codeowners_linter.checks.find_existing', wraps=find_existing) as scan:
+            files.return_value = ['a/x.py', 'c/new.txt']
+            fingerprint.return_value = 'second'
+            second = gitlab_codeowners_linter.checks._get_non_existing_paths(
+                codeowners_data, options)
+        self.assertEqual(second, (['[Test]'], {'[test]': ['*.md']}))
+        # only the path whose matching file was deleted is checked again
+        # against all the files
+        self.assertEqual(scan.call_args.args[0], ['*.md'])
+
+        # the state goes to the default cache directory unless told otherwise
+        with patch.dict(os.environ, {'XDG_CACHE_HOME': self.test_dir}):
+            self.assertEqual(
+                LintOptions(incremental=True).cache_dir,
+                os.path.join(self.test_dir, 'gitlab-codeowners-linter'))
+
+    def test_streaming_check(self):
+        for name in ['unformatted_input.txt', 'no_default_section_input.txt', 'empty_input.txt']:
+            input = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                'resources', name,
+            )
+            with patch('gitlab_codeowners_linter.checks._get_non_existing_paths') as existence:
+                existence.return_value = [], []
+                codeowners_data = parse_codeowners(input)
+                expected = check(codeowners_data).violation_error_messages
+            with open(input) as f:
+                actual = check_stream(f).violation_error_messages
+            self.assertListEqual(expected, actual, f'failed test {name}')
+            with open(input, 'rb') as f:
+                if os.path.getsize(input) == 0:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    actual = check_stream(mapped).violation_error_messages
+            self.assertListEqual(expected, actual, f'failed test {name}')
+
+    def test_single_pass_check(self):
+        codeowners_data = [
+            CodeownerSection('__default_codeowner_section__', [], [
+                CodeownerEntry('b.txt', [], '@a'),
+                CodeownerEntry('', [], ''),
+                CodeownerEntry('a.txt', [], '@a'),
+            ]),
+            CodeownerSection('[Zeta]', [], [
+                CodeownerEntry('docs/', [], '@b'),
+                CodeownerEntry('docs/', [], '@c'),
+            ]),
+            CodeownerSection('[Alpha]', [], [
+                CodeownerEntry('lib/', [], '@d'),
+                CodeownerEntry('src/', [], '@d'),
+            ]),
+            CodeownerSection('^[zeta]', [], [
+                CodeownerEntry('tests/', [], '@e'),
+            ]),
+        ]
+        with patch(
+            'gitlab_codeowners_linter.checks.path_sort_key',
+            wraps=path_sort_key,
+        ) as sort_key, patch.object(CodeownerSection, 'get_paths') as get_paths:
+            scan = scan_codeowners(codeowners_data)
+        # sortedness is a comparison of adjacent keys, one key per path
+        self.assertEqual(sort_key.call_count, 7)
+        get_paths.assert_not_called()
+        self.assertFalse(scan.empty)
+        self.assertTrue(scan.section_names_sorted)
+        self.assertListEqual(scan.duplicated_sections, ['[zeta]'])
+        self.assertListEqual(
+            scan.sections_with_blank_lines, ['__default_codeowner_section__'])
+        self.assertListEqual(
+            scan.unsorted_paths_in_sections, ['__default_codeowner_section__'])
+        self.assertListEqual(scan.sections_with_duplicate_paths, ['[Zeta]'])
+        self.assertListEqual(
+            list(scan.paths), ['b.txt', 'a.txt', 'docs/', 'lib/', 'src/', 'tests/'])
+
+    def test_data_model(self):
+        input = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'resources/unformatted_input.txt',
+        )
+        codeowners_data = parse_codeowners(input)
+        entries = [
+            entry for section in codeowners_data for entry in section.entries]
+        self.assertFalse(any(hasattr(entry, '__dict__') for entry in entries))
+        # entries without comments share the same comment block until used
+        uncommented = [entry for entry in entries if not entry._comments]
+        comment_blocks = {id(entry._comments) for entry in uncommented}
+        self.assertEqual(len(comment_blocks), 1)
+        uncommented[0].comments.extend(['# first'])
+        uncommented[1].comments.append('# second')
+        self.assertListEqual(uncommented[0].comments, ['# first'])
+        self.assertListEqual(uncommented[1].comments, ['# second'])
+        self.assertTrue(all(entry.comments == [] for entry in uncommented[2:]))
+        for section in codeowners_data:
+            self.assertListEqual(list(section.paths), section.get_paths())
+        section = codeowners_data[1]
+        paths = section.paths
+        section.entries = section.entries[:1]
+        self.assertListEqual(list(paths), section.get_paths())
+
+    def test_profiling(self):
+        input = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)),
+            'resources/existing_paths_input.txt',
+        )
+        self.assertIs(profiling.phase('parse'), profiling.phase('check'))
+
+        profiler = profiling.enable()
+        try:
+            check(parse_codeowners(input))
+        finally:
+            profiling.disable()
+        report = profiler.to_dict()
+        self.assertListEqual(
+            list(report),
+            ['parse', 'formatting_rules', 'existence',
+                'enumerate_files', 'pattern_matching'],
+        )
+        self.assertEqual(report['parse']['counts']['lines'], 42)
+        self.assertEqual(report['existence']['counts']['paths'], 22)
+        self.assertFalse(profiling.is_enabled())
+
+    def test_batch_lint(self):
+        repositories = {
+            'clean': ('a.txt @owner\n', ['a.txt']),
+            'missing_path': ('a.txt @owner\n/missing/ @owner\n', ['a.txt']),
+            'no_codeowners': (None, ['a.txt']),
+        }
+        roots = []
+        for name, (codeowners, files) in repositories.items():
+            root = os.path.join(self.test_dir, name)
+            os.makedirs(os.path.join(root, '.gitlab'))
+            for file in files:
+                open(os.path.join(root, file), 'w').close()
+            if codeowners is not None:
+                with open(os.path.join(root, '.gitlab', 'CODEOWNERS'), 'w') as f:
+                    f.write(codeowners)
+            roots.append(root)
+
+        report = lint_repositories(roots, no_autofix=True, jobs=2)
+        self.assertEqual(
+            report['summary'],
+            {'repositories': 3, 'with_violations': 1, 'errors': 1},
+        )
+        self.assertListEqual(
+            [
+                repository['violations']
+                for repository in report['repositories']
+            ],
+            [[], ['The sections __default_codeowner_section__ have non-existing paths'], []],
+        )
+        self.assertEqual(
+            report['repositories'][0]['codeowners_file'], '.gitlab/CODEOWNERS')
+
+    def test_resolver(self):
+        codeowners_data = [
+            CodeownerSection('__default_codeowner_section__', [], [
+                CodeownerEntry('*', [], ['@everyone']),
+                CodeownerEntry('/docs/', [], ['@writers']),
+            ]),
+            CodeownerSection('^[Docs]', [], [
+                CodeownerEntry('*.md', [], ['@docs']),
+                CodeownerEntry('/docs/**/*.md', [], ['@docs-lead']),
+            ]),
+            CodeownerSection('[Backend]', [], [
+                CodeownerEntry('src/', [], ['@backend']),
+                CodeownerEntry('', []),
+                CodeownerEntry('/src/api/*.py', [], ['@api']),
+            ]),
+            # sections with the same name are combined
+            CodeownerSection('[backend]', [], [
+                CodeownerEntry('*.py', [], ['@python']),
+            ]),
+        ]
+        resolver = OwnershipResolver(codeowners_data)
+
+        def resolve(path):
+            return [
+                (ownership.section, ownership.optional,
+                 ownership.entry.path, ownership.entry.owners)
+                for ownership in resolver.resolve(path)
+            ]
+
+        self.assertListEqual(resolve('docs/guide/intro.md'), [
+            ('__default_codeowner_section__', False, '/docs/', ['@writers']),
+            ('[Docs]', True, '/docs/**/*.md', ['@docs-lead']),
+        ])
+        self.assertListEqual(resolve('README.md'), [
+            ('__default_codeowner_section__', False, '*', ['@everyone']),
+            ('[Docs]', True, '*.md', ['@docs']),
+        ])
+        self.assertListEqual(resolve('src/api/users.py'), [
+            ('__default_codeowner_section__', False, '*', ['@everyone']),
+            ('[Backend]', False, '*.py', ['@python']),
+        ])
+        self.assertListEqual(resolve('src/api/schema.json'), [
+            ('__default_codeowner_section__', False, '*', ['@everyone']),
+            ('[Backend]', False, 'src/', ['@backend']),
+        ])
+        self.assertEqual(
+            [path for path, _ in resolver.resolve_many(['a', 'b'])], ['a', 'b'])
+
+    def test_shadowed_entries(self):
+        for file in ['src/a.py', 'src/b.py', 'docs/x.md']:
+            os.makedirs(
+                os.path.join(self.test_dir, os.path.dirname(file)), exist_ok=True)
+            open(os.path.join(self.test_dir, file), 'w').close()
+        codeowners_data = [
+            CodeownerSection('__default_codeowner_section__', [], [
+                CodeownerEntry('src/a.py', [], ['@a']),
+                CodeownerEntry('*.py', [], ['@python']),
+                CodeownerEntry('/docs/', [], ['@docs']),
+                CodeownerEntry('/missing/', [], ['@docs']),
+            ]),
+            CodeownerSection('[A]', [], [
+                CodeownerEntry('*.md', [], ['@md']),
+                CodeownerEntry('/docs/x.md', [], ['@x']),
+            ]),
+            CodeownerSection('[B]', [], [
+                CodeownerEntry('/src/', [], ['@src']),
+            ]),
+            # combined with [A], its entries come last
+            CodeownerSection('[a]', [], [
+                CodeownerEntry('/docs/', [], ['@docs']),
+            ]),
+        ]
+
+        violations = check(codeowners_data, LintOptions(
+            root=self.test_dir, check_shadowed=True))
+        self.assertListEqual(
+            violations.sections_with_shadowed_entries,
+            ['__default_codeowner_section__', '[A]'],
+        )
+        self.assertListEqual(
+            violations.shadowed_entries['__default_codeowner_section__'], ['src/a.py'])
+        self.assertListEqual(
+            violations.shadowed_entries['[a]'], ['*.md', '/docs/x.md'])
+        self.assertListEqual(
+            violations.sections_with_non_existing_paths, ['__default_codeowner_section__'])
+        self.assertIn(
+            'The sections __default_codeowner_section__, [A] have entries overridden by later entries',
+            violations.violation_error_messages,
+        )
+        violations = check(codeowners_data, LintOptions(root=self.test_dir))
+        self.assertListEqual(violations.sections_with_shadowed_entries, [])
+
+    def test_coverage(self):
+        codeowners_data = [
+            CodeownerSection('__default_codeowner_section__', [], [
+                CodeownerEntry('/src/app/', [], ['@app']),
+                CodeownerEntry('', []),
+                CodeownerEntry('*.md', [], ['@docs']),
+            ]),
+        ]
+        files = [
+            'README.md', 'setup.py', 'src/app/main.py', 'src/app/deep/x.py',
+            'src/lib/util.py', 'src/lib/deep/er/y.py', 'docs/index.md',
+        ]
+        report_path = os.path.join(self.test_dir, 'coverage.json')
+        with open(report_path, 'w') as stream:
+            report = compute_coverage(codeowners_data, files, 2, stream)
+        self.assertEqual((report.files, report.uncovered), (7, 3))
+        with open(report_path) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertListEqual(lines, [
+            {'uncovered': 'setup.py'},
+            {'uncovered': 'src/lib/util.py'},
+            {'uncovered': 'src/lib/deep/er/y.py'},
+            {'directory': '.', 'files': 7, 'uncovered': 3, 'coverage': 57.14},
+            {'directory': 'docs', 'files': 1, 'uncovered': 0, 'coverage': 100.0},
+            {'directory': 'src', 'files': 4, 'uncovered': 2, 'coverage': 50.0},
+            {
+                'directory': 'src/app', 'files': 2, 'uncovered': 0,
+                'coverage': 100.0,
+            },
+            {'directory': 'src/lib', 'files': 2, 'uncovered': 2, 'coverage': 0.0},
+        ])
+
+        for file in files:
+            os.makedirs(
+                os.path.join(self.test_dir, 'tree', os.path.dirname(file)),
+                exist_ok=True,
+            )
+            open(os.path.join(self.test_dir, 'tree', file), 'w').close()
+        violations = check(codeowners_data, LintOptions(
+            root=os.path.join(self.test_dir, 'tree'), min_coverage=60))
+        self.assertIn(
+            '57.14% of the files are matched by a path, below the minimum of 60%',
+            violations.violation_error_messages,
+        )
+        violations = check(codeowners_data, LintOptions(
+            root=os.path.join(self.test_dir, 'tree'), min_coverage=50))
+        self.assertAlmostEqual(violations.coverage, 400 / 7)
+        self.assertFalse(any(
+            'matched by a path' in message for message in violations.violation_error_messages))
+        # outside of git the files are matched as the tree is walked
+        with patch('gitlab_codeowners_linter.checks._walk_filepaths') as walk:
+            violations = check(codeowners_data, LintOptions(
+                root=os.path.join(self.test_dir, 'tree'), min_coverage=50,
+                select=['coverage'], exclude=['setup.py']))
+        walk.assert_not_called()
+        self.assertAlmostEqual(violations.coverage, 400 / 6)
+
+    def test_all_codeowners(self):
+        files = {
+            'CODEOWNERS': '/src/ @top\n/vendor/ @top\n',
+            'src/main.py': '',
+            'vendor/lib/.gitlab/CODEOWNERS': '/lib.py @lib\n/missing.py @lib\n',
+            # .gitlab/CODEOWNERS comes first
+            'vendor/lib/docs/CODEOWNERS': '/nothing/ @docs\n',
+            'vendor/lib/lib.py': '',
+            'vendor/app/docs/CODEOWNERS': '/app.py @app\n',
+            'vendor/app/app.py': '',
+        }
+        for file, content in files.items():
+            os.makedirs(
+                os.path.join(self.test_dir, os.path.dirname(file)), exist_ok=True)
+            with open(os.path.join(self.test_dir, file), 'w') as f:
+                f.write(content)
+
+        with patch('gitlab_codeowners_linter.checks._walk_filepaths',
+                   wraps=gitlab_codeowners_linter.checks._walk_filepaths) as walk:
+            results = lint_all_codeowners_files(
+                True, LintOptions(root=self.test_dir))
+            walk.assert_called_once()
+        self.assertDictEqual(
+            {
+                os.path.relpath(codeowners_file, self.test_dir): violations.violation_error_messages
+                for codeowners_file, violations in results.items()
+            },
+            {
+                'CODEOWNERS': [],
+                os.path.join('vendor', 'app', 'docs', 'CODEOWNERS'): [],
+                os.path.join('vendor', 'lib', '.gitlab', 'CODEOWNERS'): [
+                    'The sections __default_codeowner_section__ have non-existing paths',
+                ],
+            },
+        )
+
+        # the projects share one coverage report, relative to the root
+        coverage_report = os.path.join(self.test_dir, 'coverage.json')
+        lint_all_codeowners_files(True, LintOptions(
+            root=self.test_dir, coverage_report=coverage_report, coverage_depth=1))
+        with open(coverage_report) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertListEqual(
+            [
+                line['directory'] if 'directory' in line else line['uncovered']
+                for line in lines
+            ],
+            ['CODEOWNERS', '.', 'src', 'vendor',
+             'vendor/app/docs/CODEOWNERS', 'vendor/app', 'vendor/app/docs',
+             'vendor/lib/.gitlab/CODEOWNERS', 'vendor/lib/docs/CODEOWNERS',
+             'vendor/lib', 'vendor/lib/.gitlab', 'vendor/lib/docs'],
+        )
+
+    def test_autofix_writer(self):
+        codeowners_file = os.path.join(self.test_dir, 'CODEOWNERS')
+        with open(codeowners_file, 'w') as f:
+            f.write(
+                '\n*.md @docs\n*.py @python\n\n'
+                '[Section]\n/b/ @b\n/a/ @a\n'
+            )
+        os.chmod(codeowners_file, 0o640)
+        gitlab_codeowners_linter.checks._get_non_existing_paths = \
+            lambda *args: ([], {})
+
+        violations = lint_codeowners_file(codeowners_file, False)
+        self.assertListEqual(violations.changed_line_ranges, [(6, 7)])
+        with open(codeowners_file) as f:
+            self.assertEqual(
+                f.read(), '\n*.md @docs\n*.py @python\n\n[Section]\n/a/ @a\n/b/ @b\n')
+        self.assertEqual(os.stat(codeowners_file).st_mode & 0o777, 0o640)
+        self.assertListEqual(os.listdir(self.test_dir), ['CODEOWNERS'])
+
+        # a clean file is not written at all
+        with patch('gitlab_codeowners_linter.autofix.os.replace') as replace:
+            violations = lint_codeowners_file(codeowners_file, False)
+            replace.assert_not_called()
+        self.assertListEqual(violations.changed_line_ranges, [])
+
+    def test_violation_report(self):
+        codeowners_file = os.path.join(self.test_dir, 'CODEOWNERS')
+        with open(codeowners_file, 'w') as f:
+            f.write(
+                '\n*.md @docs\n\n'
+                '[Section]\n/b/ @b\n/a/ @a\n/a/ @a\n\n/c/ @c\n'
+            )
+        gitlab_codeowners_linter.checks._get_non_existing_paths = \
+            lambda *args: ([], {})
+
+        options = LintOptions(output_format='json')
+        violations = lint_codeowners_file(codeowners_file, False, options)
+        records = [(record.rule, record.path, record.line)
+                   for record in violations.records]
+        # the lines are those of the file before autofix
+        self.assertListEqual(records, [
+            ('blank-line', '', 8),
+            ('unsorted-paths', '/a/', 6),
+            ('duplicated-path', '/a/', 7),
+        ])
+
+        with tempfile.TemporaryFile('w+') as f:
+            write_sarif(violations.records, f)
+            f.seek(0)
+            sarif = json.load(f)
+        results = sarif['runs'][0]['results']
+        self.assertEqual(len(results), 3)
+        self.assertDictEqual(
+            results[1]['locations'][0]['physicalLocation']['region'], {'startLine': 6, 'startColumn': 1})
+
+        with tempfile.TemporaryFile('w+') as f:
+            write_codequality(violations.records, f)
+            f.seek(0)
+            issues = json.load(f)
+        self.assertListEqual(
+            [issue['location']['lines']['begin'] for issue in issues], [8, 6, 7])
+        self.assertEqual(len({issue['fingerprint'] for issue in issues}), 3)
+
+    def test_daemon_file_index(self):
+        for inotify in [_open_inotify(), None]:
+            with self.subTest(inotify=inotify is not None):
+                root = tempfile.mkdtemp(dir=self.test_dir)
+                os.makedirs(os.path.join(root, 'src'))
+                open(os.path.join(root, 'src', 'main.py'), 'w').close()
+                file_index = FileIndex(root, inotify)
+                self.assertEqual(
+                    file_index.existing_paths(['/src/', '*.md']),
+                    {'/src/': 'src/main.py'},
+                )
+                open(os.path.join(root, 'README.md'), 'w').close()
+                os.remove(os.path.join(root, 'src', 'main.py'))
+                self.assertEqual(
+                    file_index.existing_paths(['/src/', '*.md']),
+                    {'*.md': 'README.md'},
+                )
+                os.makedirs(os.path.join(root, 'src', 'app'))
+                open(os.path.join(root, 'src', 'app', 'main.py'), 'w').close()
+                self.assertEqual(
+                    file_index.existing_paths(['/src/', 'main.py']),
+                    {'/src/': 'src/app/main.py', 'main.py': 'src/app/main.py'},
+                )
+                shutil.rmtree(os.path.join(root, 'src'))
+                self.assertEqual(
+                    file_index.existing_paths(['/src/', '*.md']),
+                    {'*.md': 'README.md'},
+                )
+                if inotify is not None:
+                    inotify.close()
+
+    def test_daemon(self):
+        root = os.path.join(self.test_dir, 'repository')
+        os.makedirs(root)
+        open(os.path.join(root, 'a.txt'), 'w').close()
+        codeowners_file = os.path.join(root, 'CODEOWNERS')
+        with open(codeowners_file, 'w') as f:
+            f.write('a.txt @owner\n/missing/ @owner\n')
+
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': self.test_dir}):
+            self.assertIsNone(request_lint(codeowners_file, True, root))
+            daemon = LintDaemon(root)
+            thread = threading.Thread(target=daemon.serve_forever)
+            thread.start()
+            try:
+                for _ in range(100):
+                    if os.path.exists(daemon.socket_path):
+                        break
+                    thread.join(0.05)
+                self.assertEqual(
+                    request_lint(codeowners_file, True, root),
+                    (['The sections __default_codeowner_section__ have non-existing paths'], []),
+                )
+                os.makedirs(os.path.join(root, 'missing'))
+                open(os.path.join(root, 'missing', 'b.txt'), 'w').close()
+                self.assertEqual(
+                    request_lint(codeowners_file, True, root), ([], []))
+                # another checkout is not served by this daemon
+                self.assertIsNone(request_lint(
+                    codeowners_file, True, self.test_dir))
+            finally:
+                daemon._running = False
+                request_lint(codeowners_file, True, root)
+                thread.join()
+            self.assertFalse(os.path.exists(daemon.socket_path))
+
+        # the daemon only lints, and rewrites, the CODEOWNERS files of its root
+        victim = os.path.join(self.test_dir, 'victim.txt')
+        with open(victim, 'w') as f:
+            f.write('keep\n')
+        for request_root, request_file in [
+            (root, victim),
+            (root, os.path.join(root, 'a.txt')),
+            (self.test_dir, victim),
+        ]:
+            self.assertIn('error', daemon.handle({
+                'command': 'lint', 'root': request_root,
+                'codeowners_file': request_file, 'no_autofix': False}))
+        with open(victim) as f:
+            self.assertEqual(f.read(), 'keep\n')
+
+        # a socket directory others can write to is not trusted
+        shared_dir = os.path.join(self.test_dir, 'shared')
+        os.makedirs(shared_dir)
+        os.chmod(shared_dir, 0o777)
+        with patch.dict(os.environ, {'XDG_RUNTIME_DIR': shared_dir}):
+            daemon = LintDaemon(root)
+            os.makedirs(os.path.dirname(daemon.socket_path), mode=0o777)
+            os.chmod(os.path.dirname(daemon.socket_path), 0o777)
+            with self.assertRaises(RuntimeError):
+                daemon.serve_forever()
+            if daemon.file_index.inotify is not None:
+                daemon.file_index.inotify.close()
+            open(daemon.socket_path, 'w').close()
+            self.assertIsNone(request_lint(codeowners_file, True, root))
+
+        # the daemon only checks the default rules
+        self.assertTrue(_use_daemon(LintOptions(daemon=True)))
+        self.assertTrue(get_options(['--daemon'])[2].daemon)
+        for options in [
+            LintOptions(),
+            get_options(['--daemon', '--no_daemon'])[2],
+            LintOptions(daemon=True, check_shadowed=True),
+            LintOptions(daemon=True, min_coverage=100),
+            LintOptions(daemon=True, coverage_report='-'),
+            LintOptions(daemon=True, exclude=['build/']),
+        ]:
+            self.assertFalse(_use_daemon(options))
+
+    def test_rule_selection(self):
+        self.assertListEqual(list(select_rules()), [
+            'unsorted-sections', 'duplicated-section', 'blank-line',
+            'unsorted-paths', 'duplicated-path', 'non-existing-path'])
+        self.assertListEqual(
+            list(select_rules(['files'], enabled=['shadowed-entry'])),
+            ['non-existing-path', 'shadowed-entry'])
+        self.assertListEqual(
+            list(select_rules(
+                ['formatting'], ignore=['blank-line', 'duplicated-section'])),
+            ['unsorted-sections', 'unsorted-paths', 'duplicated-path'])
+        self.assertListEqual(
+            list(select_rules(ignore=['files'], enabled=['coverage'])),
+            ['unsorted-sections', 'duplicated-section', 'blank-line',
+             'unsorted-paths', 'duplicated-path'])
+        with patch('gitlab_codeowners_linter.rules.load_plugin_rules', return_value={}):
+            with self.assertRaises(ValueError):
+                select_rules(['no-such-rule'])
+        # the owners are only checked against a snapshot
+        with self.assertRaises(SystemExit):
+            get_options(['--select', 'unknown-owner'])
+        self.assertEqual(
+            get_options([
+                '--select', 'unknown-owner', '--owners_snapshot', 'owners.json',
+            ])[2].select,
+            ['unknown-owner'])
+
+        codeowners_file = os.path.join(self.test_dir, 'CODEOWNERS')
+        with open(codeowners_file, 'w') as f:
+            f.write('/b/ @b\n/a/\n/missing/ @c\n')
+        codeowners_data = parse_codeowners(codeowners_file)
+
+        # the formatting rules never enumerate the files
+        with patch('gitlab_codeowners_linter.checks._get_files') as files, \
+                patch('gitlab_codeowners_linter.checks._get_non_existing_paths') as existence:
+            violations = check(
+                codeowners_data, LintOptions(select=['formatting']))
+            files.assert_not_called()
+            existence.assert_not_called()
+        self.assertListEqual(violations.violation_error_messages, [
+            'The paths in sections __default_codeowner_section__ are not sorted'])
+
+        # sorting drops the blank lines even when their rule is ignored
+        with open(codeowners_file, 'w') as f:
+            f.write('/b/ @b\n\n/a/ @a\n')
+        codeowners = OwnersList(codeowners_file, False, LintOptions(
+            select=['formatting'], ignore=['blank-line'], daemon=False))
+        codeowners.lint()
+        self.assertListEqual(
+            [section.get_paths() for section in codeowners.codeowners_data],
+            [['/a/', '/b/']])
+
+        def check_owners(codeowners_data, files):
+            self.assertListEqual(files, ['a/main.py'])
+            for section in codeowners_data:
+                for entry in section.entries:
+                    if entry.path and not entry.owners:
+                        yield f'{entry.path} has no owner', section, entry
+
+        plugin_rule = Rule(
+            'owners-required', 'Paths must have an owner', FILES,
+            check=check_owners,
+        )
+        with patch('gitlab_codeowners_linter.rules.load_plugin_rules',
+                   return_value={plugin_rule.id: plugin_rule}), \
+                patch('gitlab_codeowners_linter.checks._get_files', return_value=['a/main.py']):
+            options = LintOptions(select=['owners-required'])
+            violations = check(codeowners_data, options)
+            self.assertListEqual(
+                violations.violation_error_messages, ['/a/ has no owner'])
+            records = list(iter_violations(
+                codeowners_data, violations, codeowners_file))
+        self.assertListEqual(
+            [(record.rule, record.path, record.line) for record in records],
+            [('owners-required', '/a/', 2)])
+
+    def test_owner_validation(self):
+        codeowners_file = os.path.join(self.test_dir, 'CODEOWNERS')
+        with open(codeowners_file, 'w') as f:
+            f.write('/a/ @john.doe @platform/backend John@Example.com @@maintainer\n'
+                    '/b/ @jon.doe @Platform/Backend #comment @x\n'
+                    '/c/ @nobody-at-all @jon.doe\n')
+        codeowners_data = parse_codeowners(codeowners_file)
+        json_snapshot = os.path.join(self.test_dir, 'owners.json')
+        with open(json_snapshot, 'w') as f:
+            json.dump({
+                'users': [{'username': 'john.doe', 'email': 'john@example.com'}],
+                'groups': [{'full_path': 'platform/backend'}],
+            }, f)
+        csv_snapshot = os.path.join(self.test_dir, 'owners.csv')
+        with open(csv_snapshot, 'w') as f:
+            f.write(
+                'username,email,full_path\n'
+                'john.doe,john@example.com,\n'
+                ',,platform/backend\n'
+            )
+        cache_dir = os.path.join(self.test_dir, 'cache')
+
+        for snapshot in (json_snapshot, csv_snapshot, json_snapshot):
+            options = LintOptions(
+                select=['formatting'], owners_snapshot=snapshot, cache_dir=cache_dir)
+            if snapshot == json_snapshot and os.path.isdir(cache_dir):
+                # loaded from the binary index the first run saved
+                with patch('gitlab_codeowners_linter.owners.read_snapshot') as read:
+                    violations = check(codeowners_data, options)
+                    read.assert_not_called()
+            else:
+                violations = check(codeowners_data, options)
+            self.assertListEqual(violations.violation_error_messages, [
+                'The owners @jon.doe (did you mean @john.doe?), @nobody-at-all are unknown'])
+        records = list(iter_violations(
+            codeowners_data, violations, codeowners_file))
+        self.assertListEqual(
+            [(record.rule, record.path, record.line) for record in records], [
+                ('unknown-owner', '/b/', 2),
+                ('unknown-owner', '/c/', 3),
+                ('unknown-owner', '/c/', 3),
+            ])
+
+    def test_lazy_imports(self):
+        # the modules only some runs need are not loaded by the CLI on start
+        lazy_modules = ['pathspec', 'multiprocessing', 'concurrent.futures',
+                        'ctypes', 'difflib', 'logging', 'tempfile',
+                        'importlib.metadata', 'tracemalloc', 'socket',
+                        'gitlab_codeowners_linter.autofix',
+                        'gitlab_codeowners_linter.daemon',
+                        'gitlab_codeowners_linter.daemon_client']
+        output = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, json, gitlab_codeowners_linter.codeowners_linter; '
+             'print(json.dumps(sorted(sys.modules)))'],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        loaded = set(json.loads(output))
+        self.assertListEqual(
+            [module for module in lazy_modules if module in loaded], [])
 
     def test_non_existing_path_autofix(self):
 